@@ -0,0 +1,228 @@
+"""Замеры скорости удаления без настоящего аккаунта (FakeTelegramClient)
+
+Запуск:
+
+    python benchmark.py                                   # все режимы на 10^3 и 10^4 сообщений
+    python benchmark.py --messages 1000000 --modes stream collect
+    python benchmark.py --rtt 0.05 --flood-limit DeleteMessages=5 --flood-probability 0.01
+    python benchmark.py --save baseline.json              # сохранить результаты
+    python benchmark.py --compare baseline.json           # код 1, если скорость упала
+
+Каждый режим запускается на свежем синтетическом аккаунте с теми же
+компонентами, что и настоящая очистка (сканер, конвейер удаления,
+ограничитель скорости). Для каждого режима выводятся сообщений в секунду,
+число запросов, FloodWait и время ожидания по ним, а также пик памяти
+Python (tracemalloc). --rate задает начальные скорости ограничителя, как
+в job_runner.py, поэтому лимиты можно подбирать без риска для аккаунта.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fake_telegram import FakeTelegramClient, FakeServer, CHANNEL, USER, GROUP
+from rate_limiter import AdaptiveRateLimiter, MAX_RATE
+from message_scanner import OwnMessageScanner
+from deletion_pipeline import DeletionPipeline
+from deletion_strategy import DeletionStrategies, PARTICIPANT_HISTORY
+from dialog_index import DialogIndex
+from discovery import OwnMessageDiscovery
+from bulk_cleaner import BulkCleaner
+from message_archive import MessageArchive
+
+# Режимы удаления
+STREAM = 'stream'                  # поиск и удаление одновременно (супергруппа)
+COLLECT = 'collect'                # сначала собрать id, потом удалить
+PRIVATE = 'private'                # личный диалог: сервер не фильтрует по отправителю
+PARTICIPANT = 'participant'        # channels.deleteParticipantHistory
+BULK = 'bulk'                      # много чатов: индекс диалогов, поиск чатов, параллельная очистка
+ARCHIVE = 'archive'                # как stream, но с архивом перед удалением
+MODES = (STREAM, COLLECT, PRIVATE, PARTICIPANT, BULK, ARCHIVE)
+
+# Размеры по умолчанию (число сообщений в аккаунте)
+DEFAULT_SIZES = (1000, 10000)
+# На сколько процентов может упасть скорость относительно --compare
+DEFAULT_TOLERANCE = 0.1
+
+
+def _parse_pair(text):
+    method, _, value = text.partition('=')
+    try:
+        return method, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается МЕТОД=ЧИСЛО, получено {text!r}")
+
+
+def build_layout(mode, messages, own_every, chats):
+    """Синтетические чаты для режима: [(тип, число сообщений, каждое какое ваше), ...]"""
+    if mode == PRIVATE:
+        return [(USER, messages, own_every)]
+    if mode == BULK:
+        # Поровну супергрупп, личных диалогов и обычных групп
+        size = max(1, messages // chats)
+        kinds = (CHANNEL, USER, GROUP)
+        return [(kinds[index % len(kinds)], size, own_every) for index in range(chats)]
+    return [(CHANNEL, messages, own_every)]
+
+
+async def run_mode(mode, client, limiter, options):
+    """Одна очистка всех ваших сообщений в синтетическом аккаунте"""
+    scanner = OwnMessageScanner(client, limiter, options.page_size)
+    pipeline = DeletionPipeline(client, limiter, options.batch_size, options.queue_size)
+    chat = next(iter(client.chats.values()))
+    quiet = lambda count: None
+
+    if mode in (STREAM, PRIVATE):
+        await pipeline.run(chat.input_peer, scanner.iter_pages(chat.input_peer), on_progress=quiet)
+    elif mode == COLLECT:
+        selected = await scanner.collect(chat.input_peer)
+        await pipeline.run(chat.input_peer, selected, on_progress=quiet)
+    elif mode == PARTICIPANT:
+        strategies = DeletionStrategies(client, limiter)
+        await strategies.execute(PARTICIPANT_HISTORY, {'entity': chat.input_peer})
+    elif mode == BULK:
+        dialogs = DialogIndex(client, limiter)
+        chats = await dialogs.select()
+        found = await OwnMessageDiscovery(scanner, options.concurrency).discover(chats)
+        chats = [chat for chat in chats if chat['id'] in found]
+        bulk = BulkCleaner(scanner, pipeline, options.concurrency)
+        await bulk.run(chats, bounds=found, show_progress=False)
+    elif mode == ARCHIVE:
+        directory = tempfile.mkdtemp(prefix='tg-cleaner-bench-')
+        try:
+            pipeline.archive = MessageArchive(client, directory, limiter=limiter)
+            await pipeline.run(chat.input_peer, scanner.iter_pages(chat.input_peer), on_progress=quiet)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+async def measure(mode, messages, options):
+    """Замер одного режима на messages сообщениях"""
+    layout = build_layout(mode, messages, options.own_every, options.chats)
+    server = FakeServer(options.rtt, dict(options.flood_limits or ()), options.flood_probability,
+                        options.flood_seconds, options.seed)
+    client = FakeTelegramClient.build(layout, server)
+    limiter = AdaptiveRateLimiter(dict(options.rates or ()), max_rate=options.max_rate)
+    own_total = client.own_left()
+
+    tracemalloc.start()
+    started = time.monotonic()
+    try:
+        # Прогресс и сообщения о FloodWait только мешают замеру
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if not options.verbose else sys.stdout):
+            await run_mode(mode, client, limiter, options)
+        seconds = time.monotonic() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    deleted = own_total - client.own_left()
+    buckets = limiter.state().values()
+    return {
+        'mode': mode,
+        'messages': messages,
+        'own': own_total,
+        'deleted': deleted,
+        'complete': deleted == own_total,
+        'seconds': round(seconds, 3),
+        'msgs_per_s': round(deleted / seconds, 1) if seconds else None,
+        'requests': client.requests,
+        'requests_by_method': dict(server.requests),
+        'flood_waits': server.flood_waits,
+        'flood_wait_s': sum(bucket['flood_seconds'] for bucket in buckets),
+        'peak_mb': round(peak / 2 ** 20, 2)
+    }
+
+
+def format_row(row):
+    status = "" if row['complete'] else f" ⚠️ удалено {row['deleted']}/{row['own']}"
+    return (
+        f"{row['mode']:<12} {row['messages']:>9} {row['seconds']:>9.2f} {row['msgs_per_s'] or 0:>10.1f} "
+        f"{row['requests']:>9} {row['flood_waits']:>7} {row['flood_wait_s']:>8} {row['peak_mb']:>8.2f}{status}"
+    )
+
+
+def compare(rows, baseline, tolerance):
+    """Список регрессий: режимы, где скорость упала больше чем на tolerance"""
+    previous = {(row['mode'], row['messages']): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = previous.get((row['mode'], row['messages']))
+        if not old or not old.get('msgs_per_s') or not row['msgs_per_s']:
+            continue
+        change = row['msgs_per_s'] / old['msgs_per_s'] - 1
+        if change < -tolerance:
+            regressions.append((row, old, change))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Замеры скорости удаления на синтетическом аккаунте")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES), help="режимы удаления")
+    parser.add_argument('--messages', nargs='+', type=int, default=list(DEFAULT_SIZES),
+                        help="число сообщений в аккаунте (можно несколько)")
+    parser.add_argument('--own-every', type=int, default=2, help="ваше каждое N-е сообщение")
+    parser.add_argument('--chats', type=int, default=12, help="число чатов в режиме bulk")
+    parser.add_argument('--rtt', type=float, default=0.0, help="задержка каждого запроса, в секундах")
+    parser.add_argument('--flood-limit', type=_parse_pair, action='append', dest='flood_limits',
+                        help="предел сервера, например DeleteMessages=5 (запросов в секунду)")
+    parser.add_argument('--flood-probability', type=float, default=0.0, help="вероятность FloodWait на любой запрос")
+    parser.add_argument('--flood-seconds', type=int, default=1, help="длительность FloodWait, в секундах")
+    parser.add_argument('--rate', type=_parse_pair, action='append', dest='rates',
+                        help="начальная скорость ограничителя, например DeleteMessages=20")
+    parser.add_argument('--max-rate', type=float, default=MAX_RATE, help="предел скорости ограничителя")
+    parser.add_argument('--page-size', type=int, default=100, help="сообщений на страницу поиска")
+    parser.add_argument('--batch-size', type=int, default=100, help="id в одном запросе удаления")
+    parser.add_argument('--queue-size', type=int, default=4, help="размер очереди конвейера")
+    parser.add_argument('--concurrency', type=int, default=4, help="чатов одновременно в режиме bulk")
+    parser.add_argument('--seed', type=int, default=0, help="зерно случайных FloodWait")
+    parser.add_argument('--json', action='store_true', help="вывод по одной JSON-строке на замер")
+    parser.add_argument('--save', help="сохранить результаты в файл JSON")
+    parser.add_argument('--compare', help="сравнить с сохраненными результатами")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="допустимое падение скорости при --compare (0.1 = 10%%)")
+    parser.add_argument('--verbose', action='store_true', help="показывать вывод компонентов")
+    return parser
+
+
+async def run(options):
+    rows = []
+    if not options.json:
+        print(f"{'режим':<12} {'сообщений':>9} {'секунд':>9} {'сообщ/с':>10} "
+              f"{'запросов':>9} {'flood':>7} {'ждали,с':>8} {'пик МБ':>8}")
+    for messages in options.messages:
+        for mode in options.modes:
+            row = await measure(mode, messages, options)
+            rows.append(row)
+            print(json.dumps(row, ensure_ascii=False) if options.json else format_row(row), flush=True)
+    return rows
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    rows = asyncio.run(run(options))
+
+    if options.save:
+        with open(options.save, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    exit_code = 0 if all(row['complete'] for row in rows) else 1
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as f:
+            regressions = compare(rows, json.load(f), options.tolerance)
+        for row, old, change in regressions:
+            print(f"📉 {row['mode']} ({row['messages']}): {old['msgs_per_s']} -> {row['msgs_per_s']} сообщ/с "
+                  f"({change * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Параллельная очистка многих чатов с общим бюджетом запросов"""
+import asyncio
+import logging
+from telethon import errors
+from rate_limiter import DELETE_MESSAGES, CHANNEL_DELETE_MESSAGES
+from deletion_strategy import ID_BATCHES
+import events
+
+# Сколько чатов обрабатывается одновременно
+CONCURRENCY = 4
+# Как часто обновляется строка общего прогресса, в секундах
+REPORT_INTERVAL = 1.0
+# Сколько разных предупреждений показывать в итоге под строкой прогресса
+NOTES_LIMIT = 10
+# События, которые уже учтены в итогах по чатам и не повторяются в сводке
+COUNTED_EVENTS = ('progress', 'messages_skipped')
+
+
+class BulkProgress:
+    """Общий прогресс по всем чатам в одной строке.
+
+    События модулей очистки (events.report) во время работы не печатаются
+    поверх строки: FloodWait учитывается в самой строке, а предупреждения
+    и ошибки пачек без повторов выводятся один раз после нее.
+    """
+
+    def __init__(self, total_chats, limiter):
+        self.total_chats = total_chats
+        self.limiter = limiter
+        self.done = 0
+        self.failed = 0
+        self.active = 0
+        self.deleted = 0
+        self.flood_waits = 0
+        self.flood_seconds = 0
+        self.notes = []
+        self.notes_dropped = 0
+
+    def on_deleted(self, count):
+        self.deleted += count
+
+    def on_event(self, record):
+        event = getattr(record, 'event', None)
+        if event == 'flood_wait':
+            self.flood_waits += 1
+            self.flood_seconds += record.fields.get('seconds', 0)
+        elif event in COUNTED_EVENTS or record.levelno < logging.WARNING:
+            return
+        elif record.getMessage() in self.notes:
+            return
+        elif len(self.notes) < NOTES_LIMIT:
+            self.notes.append(record.getMessage())
+        else:
+            self.notes_dropped += 1
+
+    def line(self):
+        rates = [
+            self.limiter.rate(method)
+            for method in (DELETE_MESSAGES, CHANNEL_DELETE_MESSAGES)
+            if method in self.limiter.buckets
+        ]
+        rate = f" | ⚡ {max(rates):.2f} запр/с" if rates else ""
+        failed = f" | ошибок: {self.failed}" if self.failed else ""
+        flood = f" | ⏰ FloodWait: {self.flood_waits} ({self.flood_seconds} с)" if self.flood_waits else ""
+        return (
+            f"📊 Чаты: {self.done}/{self.total_chats} | в работе: {self.active}"
+            f" | удалено: {self.deleted}{failed}{flood}{rate}"
+        )
+
+    def render(self, final=False):
+        print("\r" + self.line(), end="\n" if final else "", flush=True)
+        if final:
+            for note in self.notes:
+                print(note)
+            if self.notes_dropped:
+                print(f"   ... и еще {self.notes_dropped} похожих сообщений")
+
+
+class _ProgressEvents(logging.Handler):
+    """Передает события модулей очистки в BulkProgress вместо печати"""
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def emit(self, record):
+        self.progress.on_event(record)
+
+
+class BulkCleaner:
+    """Удаление ваших сообщений во многих чатах с ограниченной параллельностью.
+
+    Поиск в разных чатах идет одновременно, а все запросы на удаление
+    проходят через общий ограничитель аккаунта, поэтому параллельность
+    не приводит к лишним FloodWait.
+    """
+
+    def __init__(self, scanner, pipeline, concurrency=CONCURRENCY, checkpoints=None, strategies=None):
+        self.scanner = scanner
+        self.pipeline = pipeline
+        self.concurrency = max(1, concurrency)
+        self.checkpoints = checkpoints
+        self.strategies = strategies
+
+    async def _clean_chat(self, chat, selection, allow_revoke_history, bounds, semaphore, progress, results):
+        async with semaphore:
+            progress.active += 1
+            result = {'name': chat['name'], 'deleted': 0, 'skipped': 0, 'failed': 0,
+                      'error': None, 'strategy': ID_BATCHES}
+            try:
+                strategy = ID_BATCHES
+                if self.strategies:
+                    strategy = self.strategies.choose(chat, selection, allow_revoke_history)
+
+                if strategy != ID_BATCHES:
+                    try:
+                        result['deleted'] = await self.strategies.execute(strategy, chat)
+                        result['strategy'] = strategy
+                        progress.on_deleted(result['deleted'])
+                        return
+                    except errors.RPCError:
+                        # Например, права админа отозваны: удаляем пачками
+                        pass
+
+                # Если заранее известны самый новый и самый старый id, поиск
+                # сразу ограничивается этим диапазоном
+                min_id = max_id = 0
+                if chat['id'] in bounds:
+                    min_id = bounds[chat['id']]['oldest_id'] - 1
+                    max_id = bounds[chat['id']]['newest_id'] + 1
+
+                checkpoint = None
+                if self.checkpoints and not (selection and not selection.is_all):
+                    # Продолжаем прерванную очистку или берем только новые сообщения
+                    checkpoint = self.checkpoints.begin(chat['id'])
+                    min_id = max(min_id, checkpoint.min_id)
+                    max_id = checkpoint.max_id or max_id
+
+                pages = self.scanner.iter_pages(chat['entity'], min_id, max_id, selection)
+
+                stats = await self.pipeline.run(
+                    chat['entity'], pages, on_progress=progress.on_deleted, checkpoint=checkpoint
+                )
+                result.update(stats)
+                if stats['failed']:
+                    progress.failed += 1
+            except Exception as e:
+                result['error'] = str(e)
+                progress.failed += 1
+            finally:
+                progress.active -= 1
+                progress.done += 1
+                results[chat['id']] = result
+
+    async def _report(self, progress):
+        while True:
+            progress.render()
+            await asyncio.sleep(REPORT_INTERVAL)
+
+    async def run(self, chats, selection=None, allow_revoke_history=False, bounds=None, show_progress=True):
+        """Очищает все чаты из списка без подтверждений по каждому чату.
+
+        selection (MessageSelection) ограничивает удаление периодом. Если
+        он не задан, удаляются все ваши сообщения, а прогресс сохраняется в
+        хранилище контрольных точек. allow_revoke_history разрешает очищать
+        личные диалоги целиком у обоих собеседников. bounds - результат
+        OwnMessageDiscovery.discover(), сужает поиск в каждом чате.
+        show_progress=False отключает строку прогресса в консоли; со строкой
+        события модулей очистки на время работы уходят в нее, а не печатаются
+        (см. BulkProgress). Возвращает словарь
+        {id чата: {'name', 'deleted', 'skipped', 'failed', 'error', 'strategy'}}:
+        skipped - сообщения, которые сервер отказался удалять, failed - не
+        удаленные из-за ошибки (чат можно очистить повторно).
+        """
+        bounds = bounds or {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        progress = BulkProgress(len(chats), self.pipeline.limiter)
+        results = {}
+
+        reporter = None
+        if show_progress:
+            saved = events.logger.handlers, events.logger.propagate
+            events.logger.handlers = [_ProgressEvents(progress)]
+            events.logger.propagate = False
+            reporter = asyncio.create_task(self._report(progress))
+        try:
+            await asyncio.gather(*(
+                self._clean_chat(chat, selection, allow_revoke_history, bounds, semaphore, progress, results)
+                for chat in chats
+            ))
+        finally:
+            if reporter:
+                reporter.cancel()
+                try:
+                    await reporter
+                except asyncio.CancelledError:
+                    pass
+                events.logger.handlers, events.logger.propagate = saved
+                progress.render(final=True)
+
+        return results
@@ -0,0 +1,131 @@
+"""Локальное хранилище прогресса очистки (SQLite)"""
+import sqlite3
+import time
+
+# Файл состояния рядом со скриптом
+STATE_PATH = 'cleaner_state.db'
+# Область очистки "все ваши сообщения в чате"
+SCOPE_ALL = 'all'
+
+
+class ChatCheckpoint:
+    """Прогресс одной очистки чата.
+
+    Сообщения обходятся от новых к старым в диапазоне (min_id, max_id).
+    После каждой удаленной пачки запоминается самый старый удаленный id,
+    поэтому прерванная очистка продолжается ровно с того же места. Когда
+    проход завершен, самый новый id становится нижней границей (min_id)
+    для следующих запусков.
+    """
+
+    def __init__(self, store, chat_id, scope, min_id, max_id=0, top_id=None):
+        self.store = store
+        self.chat_id = chat_id
+        self.scope = scope
+        self.min_id = min_id
+        self.max_id = max_id
+        self.top_id = top_id
+
+    @property
+    def resumed(self):
+        return bool(self.max_id)
+
+    def on_batch_deleted(self, message_ids):
+        if self.top_id is None:
+            self.top_id = max(message_ids)
+        self.max_id = min(message_ids)
+        self.store._save_job(self)
+
+    def complete(self):
+        self.store._finish_job(self)
+
+
+class CheckpointStore:
+    """Хранит для каждого чата границу уже очищенной истории и незавершенные задания"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS sweeps (
+                chat_id INTEGER NOT NULL,
+                scope TEXT NOT NULL,
+                swept_max_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, scope)
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                chat_id INTEGER NOT NULL,
+                scope TEXT NOT NULL,
+                min_id INTEGER NOT NULL,
+                max_id INTEGER NOT NULL,
+                top_id INTEGER,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, scope)
+            );
+            CREATE TABLE IF NOT EXISTS skipped (
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                PRIMARY KEY (chat_id, message_id)
+            );
+        ''')
+        self.db.commit()
+
+    def swept_max_id(self, chat_id, scope=SCOPE_ALL):
+        """Самый новый id, до которого чат уже полностью очищен"""
+        row = self.db.execute(
+            'SELECT swept_max_id FROM sweeps WHERE chat_id = ? AND scope = ?',
+            (chat_id, scope)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def begin(self, chat_id, scope=SCOPE_ALL):
+        """Начинает очистку чата или продолжает прерванную"""
+        row = self.db.execute(
+            'SELECT min_id, max_id, top_id FROM jobs WHERE chat_id = ? AND scope = ?',
+            (chat_id, scope)
+        ).fetchone()
+        if row:
+            return ChatCheckpoint(self, chat_id, scope, *row)
+
+        return ChatCheckpoint(self, chat_id, scope, self.swept_max_id(chat_id, scope))
+
+    def _save_job(self, checkpoint):
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO jobs (chat_id, scope, min_id, max_id, top_id, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (checkpoint.chat_id, checkpoint.scope, checkpoint.min_id,
+                 checkpoint.max_id, checkpoint.top_id, time.time())
+            )
+
+    def _finish_job(self, checkpoint):
+        swept_max_id = max(checkpoint.min_id, checkpoint.top_id or 0)
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO sweeps (chat_id, scope, swept_max_id, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (checkpoint.chat_id, checkpoint.scope, swept_max_id, time.time())
+            )
+            self.db.execute(
+                'DELETE FROM jobs WHERE chat_id = ? AND scope = ?',
+                (checkpoint.chat_id, checkpoint.scope)
+            )
+
+    def skipped_ids(self, chat_id):
+        """id сообщений чата, которые раньше не удалось удалить"""
+        rows = self.db.execute('SELECT message_id FROM skipped WHERE chat_id = ?', (chat_id,))
+        return {row[0] for row in rows}
+
+    def add_skipped(self, chat_id, message_ids):
+        """Запоминает неудаляемые сообщения, чтобы не пытаться удалить их снова"""
+        with self.db:
+            self.db.executemany(
+                'INSERT OR IGNORE INTO skipped (chat_id, message_id) VALUES (?, ?)',
+                [(chat_id, message_id) for message_id in message_ids]
+            )
+
+    def close(self):
+        self.db.close()
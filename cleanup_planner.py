@@ -0,0 +1,130 @@
+"""Оценка объема удаления по счетчикам сервера, без загрузки сообщений"""
+import asyncio
+import math
+from telethon.tl import types
+from message_scanner import MEDIA_FILTERS, PAGE_SIZE
+from deletion_pipeline import BATCH_SIZE
+from rate_limiter import (
+    SEARCH, DELETE_MESSAGES, CHANNEL_DELETE_MESSAGES, CHANNEL_DELETE_PARTICIPANT_HISTORY, DELETE_HISTORY
+)
+from deletion_strategy import DeletionStrategies, ID_BATCHES, PARTICIPANT_HISTORY, REVOKE_HISTORY, STRATEGY_NAMES
+
+# Сколько чатов оценивается одновременно
+CONCURRENCY = 4
+
+MEDIA_ICONS = {
+    'photo': "📷", 'video': "🎥", 'gif': "🎞", 'voice': "🎤",
+    'round': "⭕", 'music': "🎵", 'document': "📄", 'url': "🔗"
+}
+
+
+def _format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} с"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} мин"
+    return f"{seconds / 3600:.1f} ч"
+
+
+class CleanupPlanner:
+    """Строит план удаления по чатам: сколько сообщений и сколько времени.
+
+    Для каждого чата делается один запрос messages.search с limit=0 (и по
+    одному на каждый тип медиа, если нужна разбивка). Время оценивается по
+    текущей скорости общего ограничителя: поиск и удаление идут параллельно,
+    поэтому берется большее из двух. Для каждого чата указывается способ
+    удаления, который будет выбран (см. DeletionStrategies).
+    """
+
+    def __init__(self, scanner, strategies=None, concurrency=CONCURRENCY):
+        self.scanner = scanner
+        self.limiter = scanner.limiter
+        self.strategies = strategies or DeletionStrategies(scanner.client, scanner.limiter)
+        self.concurrency = max(1, concurrency)
+
+    def _estimate_seconds(self, count, delete_method):
+        if not count:
+            return 0.0
+        search_requests = math.ceil(count / PAGE_SIZE)
+        delete_requests = math.ceil(count / BATCH_SIZE)
+        return max(
+            search_requests / self.limiter.rate(SEARCH),
+            delete_requests / self.limiter.rate(delete_method)
+        )
+
+    async def estimate(self, chat, selection=None, by_media=False, allow_revoke_history=False):
+        """Оценка для одного чата"""
+        strategy = self.strategies.choose(chat, selection, allow_revoke_history)
+        peer = await self.scanner.client.get_input_entity(chat['entity'])
+        private = isinstance(peer, (types.InputPeerUser, types.InputPeerSelf))
+        delete_method = CHANNEL_DELETE_MESSAGES if isinstance(peer, types.InputPeerChannel) else DELETE_MESSAGES
+
+        count = await self.scanner.server_count(peer, selection)
+        media = {}
+        if by_media and count and not (selection and selection.media):
+            for name, message_filter in MEDIA_FILTERS.items():
+                media[name] = await self.scanner.server_count(peer, selection, message_filter())
+
+        if strategy == ID_BATCHES:
+            requests = math.ceil(count / PAGE_SIZE) + math.ceil(count / BATCH_SIZE)
+            seconds = self._estimate_seconds(count, delete_method)
+        else:
+            # Один запрос на весь чат (сервер может попросить повторить для остатка)
+            method = CHANNEL_DELETE_PARTICIPANT_HISTORY if strategy == PARTICIPANT_HISTORY else DELETE_HISTORY
+            requests = 1 if count else 0
+            seconds = requests / self.limiter.rate(method)
+
+        # В личных диалогах сервер считает и сообщения собеседника, а
+        # регулярное выражение проверяется только на клиенте
+        client_side = selection is not None and selection.pattern is not None
+        return {
+            'chat': chat,
+            'count': count,
+            'upper_bound': (private and strategy != REVOKE_HISTORY) or client_side,
+            'media': media,
+            'strategy': strategy,
+            'requests': requests,
+            'seconds': seconds
+        }
+
+    async def plan(self, chats, selection=None, by_media=False, allow_revoke_history=False):
+        """Оценки для списка чатов (ошибки не прерывают остальные)"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def estimate(chat):
+            async with semaphore:
+                try:
+                    return await self.estimate(chat, selection, by_media, allow_revoke_history)
+                except Exception as e:
+                    return {'chat': chat, 'error': str(e)}
+
+        return await asyncio.gather(*(estimate(chat) for chat in chats))
+
+
+def format_plan(rows):
+    """Таблица плана для вывода в консоль"""
+    lines = [f"{'№':>4}  {'Сообщений':>10}  {'Запросов':>8}  {'Время':>7}  Чат [способ]"]
+    total_count = total_requests = total_seconds = 0
+
+    for i, row in enumerate(rows, 1):
+        name = row['chat']['name']
+        if 'error' in row:
+            lines.append(f"{i:4d}  {'-':>10}  {'-':>8}  {'-':>7}  {name} (❌ {row['error']})")
+            continue
+
+        count = f"≤{row['count']}" if row['upper_bound'] else str(row['count'])
+        media = " ".join(
+            f"{MEDIA_ICONS[kind]}{number}" for kind, number in row['media'].items() if number
+        )
+        lines.append(
+            f"{i:4d}  {count:>10}  {row['requests']:>8}  {_format_duration(row['seconds']):>7}  {name}"
+            f" [{STRATEGY_NAMES[row['strategy']]}]" + (f"  {media}" if media else "")
+        )
+        total_count += row['count']
+        total_requests += row['requests']
+        total_seconds += row['seconds']
+
+    lines.append(
+        f"{'Итого':>4}  {total_count:>10}  {total_requests:>8}  {_format_duration(total_seconds):>7}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,284 @@
+"""Потоковое удаление: поиск и удаление сообщений работают одновременно"""
+import asyncio
+import contextlib
+import logging
+from telethon import errors, utils
+from telethon.tl import types
+from rate_limiter import AdaptiveRateLimiter, DELETE_MESSAGES, CHANNEL_DELETE_MESSAGES, GET_MESSAGES
+from id_set import MessageIdSet
+from events import report
+
+# Сколько id удаляется за один запрос
+BATCH_SIZE = 100
+# Сколько готовых пачек может ждать удаления (ограничивает память)
+QUEUE_SIZE = 4
+# Сколько раз повторять пачку после временной ошибки сервера или сети
+RETRIES = 3
+# Пауза перед первым повтором, в секундах (дальше удваивается)
+RETRY_DELAY = 2.0
+# После скольких не удаленных пачек подряд чат больше не удаляется
+FAILED_BATCHES_LIMIT = 3
+
+# Ошибки, после которых тот же запрос стоит повторить
+TRANSIENT_ERRORS = (errors.ServerError, errors.TimedOutError, ConnectionError, asyncio.TimeoutError)
+# Ошибки из-за отдельных сообщений пачки: их нужно найти и пропустить
+PER_MESSAGE_ERRORS = (errors.MessageDeleteForbiddenError, errors.MessageIdInvalidError)
+
+
+def _new_stats():
+    return {'deleted': 0, 'skipped': 0, 'failed': 0}
+
+
+class DeletionPipeline:
+    """Производитель/потребитель поверх asyncio.Queue.
+
+    Одна задача обходит историю и складывает пачки id в очередь ограниченного
+    размера, другая в это же время их удаляет. В памяти одновременно находится
+    не больше QUEUE_SIZE + 1 пачек, сколько бы сообщений ни было в чате.
+
+    Одно неудаляемое сообщение не останавливает чат: пачка, которую сервер
+    отклонил, делится пополам, пока не останутся отдельные неудаляемые id.
+    Они пропускаются и, если задан skip_store (CheckpointStore), запоминаются,
+    чтобы следующие запуски не тратили на них запросы. Временные ошибки
+    сервера и сети повторяются с растущей паузой; пачка, которую так и не
+    удалось удалить, считается не удаленной, а чат продолжается со следующей.
+
+    Если задан archive (MessageArchive), каждая пачка сначала записывается
+    в архив и попадает в очередь на удаление только после записи на диск.
+    Архивирование идет в производителе, поэтому оно совпадает по времени с
+    удалением предыдущей пачки и почти не замедляет очистку.
+
+    Если задан metrics (Metrics), по каждому чату считаются удаленные,
+    пропущенные и не удаленные сообщения и глубина очереди, а чат и каждая
+    пачка записываются интервалами трассировки.
+    """
+
+    def __init__(self, client, limiter=None, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE, skip_store=None,
+                 archive=None, metrics=None):
+        self.client = client
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.skip_store = skip_store
+        self.archive = archive
+        self.metrics = metrics
+
+    def _span(self, name, **fields):
+        return self.metrics.span(name, **fields) if self.metrics else contextlib.nullcontext(fields)
+
+    def _count(self, chat_id, **counts):
+        if not self.metrics:
+            return
+        for name, value in counts.items():
+            if value:
+                self.metrics.inc(f'tg_cleaner_messages_{name}_total', value, chat=chat_id)
+        self.metrics.progress()
+
+    async def _put(self, queue, chat_id, messages, known_skipped):
+        """Архивирует пачку сообщений (если архив включен) и отдает ее id на удаление"""
+        if self.archive:
+            with self._span('archive_batch', chat_id=chat_id, size=len(messages)):
+                await self.archive.write(chat_id, [m for m in messages if m.id not in known_skipped])
+        await queue.put([message.id for message in messages])
+
+    async def _produce(self, peer, chat_id, pages, queue, known_skipped):
+        """Собирает id из страниц поиска в пачки и кладет их в очередь"""
+        try:
+            if isinstance(pages, MessageIdSet) and self.archive and not pages.archived:
+                # Известны только id (например, из очереди автоудаления): для архива сообщения загружаются заново
+                for batch in pages.batches(self.batch_size):
+                    with self._span('archive_batch', chat_id=chat_id, size=len(batch)):
+                        messages = await self.limiter.call(
+                            GET_MESSAGES, self.client.get_messages, peer, ids=batch
+                        )
+                        await self.archive.write(chat_id, [
+                            m for m in messages if m is not None and m.id not in known_skipped
+                        ])
+                    await queue.put(batch)
+            elif isinstance(pages, MessageIdSet):
+                # Уже найденные (и, если нужно, заархивированные при сборе) id
+                for batch in pages.batches(self.batch_size):
+                    await queue.put(batch)
+            else:
+                batch = []
+                async for page in pages:
+                    for message in page:
+                        batch.append(message)
+                        if len(batch) >= self.batch_size:
+                            await self._put(queue, chat_id, batch, known_skipped)
+                            batch = []
+                if batch:
+                    await self._put(queue, chat_id, batch, known_skipped)
+        except Exception:
+            # Останавливаем потребителя, сама ошибка поднимется в run()
+            await queue.put(None)
+            raise
+        await queue.put(None)
+
+    @staticmethod
+    def _fail(message_ids, error, stats):
+        report('batch_failed', f"❌ Ошибка при удалении {len(message_ids)} сообщений: {error}",
+               logging.ERROR, size=len(message_ids), error=str(error))
+        stats['failed'] += len(message_ids)
+        return [], message_ids
+
+    async def _delete_batch(self, peer, method, message_ids, stats):
+        """Удаляет пачку id. Возвращает (неудаляемые id, id, не удаленные из-за ошибки).
+
+        Если сервер отклоняет пачку из-за отдельных сообщений, она делится
+        пополам и каждая половина удаляется отдельно: на k неудаляемых id
+        уходит порядка k * log2(размер пачки) лишних запросов. Временные
+        ошибки повторяются RETRIES раз, после этого (и после любой другой
+        ошибки сервера) id пачки считаются не удаленными.
+        """
+        for attempt in range(RETRIES + 1):
+            try:
+                # После FloodWait ограничитель повторяет эту же пачку
+                await self.limiter.call(method, self.client.delete_messages, peer, message_ids)
+                stats['deleted'] += len(message_ids)
+                return [], []
+            except PER_MESSAGE_ERRORS:
+                if len(message_ids) == 1:
+                    stats['skipped'] += 1
+                    return message_ids, []
+                middle = len(message_ids) // 2
+                skipped, failed = await self._delete_batch(peer, method, message_ids[:middle], stats)
+                more_skipped, more_failed = await self._delete_batch(peer, method, message_ids[middle:], stats)
+                return skipped + more_skipped, failed + more_failed
+            except TRANSIENT_ERRORS as e:
+                if attempt == RETRIES:
+                    return self._fail(message_ids, e, stats)
+                delay = RETRY_DELAY * 2 ** attempt
+                report('batch_retry', f"⚠️ Временная ошибка ({e}), повтор через {delay:.0f} с...",
+                       logging.WARNING, size=len(message_ids), error=str(e), delay=delay)
+                await asyncio.sleep(delay)
+            except errors.RPCError as e:
+                return self._fail(message_ids, e, stats)
+
+    async def _consume(self, peer, chat_id, queue, total, on_progress, on_failed, checkpoint, stats, known_skipped):
+        """Удаляет пачки из очереди, пока производитель не закончит.
+
+        Заполняет stats и возвращает признак того, что все сообщения
+        обработаны без ошибок. Пачка с ошибкой не останавливает чат, но после
+        FAILED_BATCHES_LIMIT таких пачек подряд запросы на удаление больше не
+        отправляются: оставшиеся пачки только пересчитываются как не
+        удаленные, чтобы итог по чату был полным. Контрольная точка после
+        первой ошибки не сдвигается, и следующий запуск начнет с этого места.
+        """
+        method = CHANNEL_DELETE_MESSAGES if isinstance(peer, types.InputPeerChannel) else DELETE_MESSAGES
+        failed_in_row = 0
+        clean = True
+
+        while True:
+            message_ids = await queue.get()
+            if message_ids is None:
+                return clean
+
+            batch = message_ids
+            if known_skipped:
+                batch = [message_id for message_id in message_ids if message_id not in known_skipped]
+            undownloaded = self.archive.download_failed.get(chat_id) if self.archive else None
+            if undownloaded:
+                # Вложения этих сообщений не попали в архив: удалять их нельзя
+                kept = [message_id for message_id in batch if message_id in undownloaded]
+                if kept:
+                    batch = [message_id for message_id in batch if message_id not in undownloaded]
+                    stats['failed'] += len(kept)
+                    self._count(chat_id, failed=len(kept))
+                    clean = False
+                    if on_failed:
+                        on_failed(kept)
+            if self.metrics:
+                self.metrics.set('tg_cleaner_queue_depth', queue.qsize(), chat=chat_id)
+
+            if failed_in_row >= FAILED_BATCHES_LIMIT:
+                stats['failed'] += len(batch)
+                self._count(chat_id, failed=len(batch))
+                if on_failed and batch:
+                    on_failed(batch)
+                continue
+
+            with self._span('delete_batch', chat_id=chat_id, size=len(batch)) as span:
+                skipped, failed = await self._delete_batch(peer, method, batch, stats) if batch else ([], [])
+                span['skipped'] = len(skipped)
+                if failed:
+                    span['failed'] = len(failed)
+            deleted = len(batch) - len(skipped) - len(failed)
+            self._count(chat_id, deleted=deleted, skipped=len(skipped), failed=len(failed))
+
+            if skipped:
+                report('messages_skipped', f"⚠️ Пропущено {len(skipped)} сообщений, которые нельзя удалить",
+                       logging.WARNING, chat_id=chat_id, count=len(skipped))
+                if self.skip_store:
+                    self.skip_store.add_skipped(chat_id, skipped)
+
+            if failed:
+                clean = False
+                failed_in_row += 1
+                if on_failed:
+                    on_failed(failed)
+                if failed_in_row == FAILED_BATCHES_LIMIT:
+                    report('chat_stopped', f"❌ {FAILED_BATCHES_LIMIT} пачки подряд не удалены: удаление в этом "
+                           f"чате остановлено, оставшиеся сообщения будут посчитаны как не удаленные",
+                           logging.ERROR, chat_id=chat_id, failed_batches=FAILED_BATCHES_LIMIT)
+            else:
+                failed_in_row = 0
+
+            if checkpoint and clean:
+                checkpoint.on_batch_deleted(message_ids)
+
+            if on_progress:
+                on_progress(deleted)
+                continue
+
+            rate = self.limiter.rate(method)
+            deleted_count = stats['deleted']
+            if total:
+                progress = (deleted_count / total) * 100
+                text = f"📊 Прогресс: {deleted_count}/{total} ({progress:.1f}%) | ⚡ {rate:.2f} запр/с"
+            else:
+                text = f"📊 Прогресс: {deleted_count} | ⚡ {rate:.2f} запр/с"
+            report('progress', text, chat_id=chat_id, deleted=deleted_count, total=total, rate=round(rate, 2))
+
+    async def run(self, entity, pages, total=None, on_progress=None, checkpoint=None, on_failed=None):
+        """Удаляет все сообщения из асинхронного потока страниц или из MessageIdSet.
+
+        total используется только для отображения прогресса. Если передан
+        on_progress, вместо печати прогресса он вызывается с размером
+        каждой удаленной пачки. checkpoint (ChatCheckpoint) сохраняет
+        прогресс после каждой пачки и закрывается, если поток удален целиком
+        и без ошибок.
+        on_failed вызывается со списком id, не удаленных из-за ошибки или
+        из-за того, что их вложение не скачалось в архив (их можно повторить
+        позже). Возвращает словарь {'deleted', 'skipped',
+        'failed'}: удалено, пропущено как неудаляемые и не удалено из-за ошибки.
+        """
+        peer = await self.client.get_input_entity(entity)
+        chat_id = utils.get_peer_id(peer)
+        known_skipped = self.skip_store.skipped_ids(chat_id) if self.skip_store else set()
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self._produce(peer, chat_id, pages, queue, known_skipped))
+        stats = _new_stats()
+
+        with self._span('chat', chat_id=chat_id) as span:
+            try:
+                completed = await self._consume(
+                    peer, chat_id, queue, total, on_progress, on_failed, checkpoint, stats, known_skipped
+                )
+            finally:
+                if not producer.done():
+                    producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+                finally:
+                    if self.archive:
+                        self.archive.download_failed.pop(chat_id, None)
+                span.update(stats)
+
+        if completed and checkpoint:
+            checkpoint.complete()
+
+        return stats
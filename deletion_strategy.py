@@ -0,0 +1,75 @@
+"""Выбор самого дешевого способа удаления для каждого чата"""
+from telethon.tl import types
+from telethon.tl.functions.channels import DeleteParticipantHistoryRequest
+from telethon.tl.functions.messages import DeleteHistoryRequest
+from rate_limiter import AdaptiveRateLimiter, CHANNEL_DELETE_PARTICIPANT_HISTORY, DELETE_HISTORY
+from dialog_index import GROUP
+
+# Удаление пачками по 100 id (работает везде)
+ID_BATCHES = 'id_batches'
+# channels.deleteParticipantHistory: все ваши сообщения в супергруппе, где вы админ
+PARTICIPANT_HISTORY = 'participant_history'
+# messages.deleteHistory(revoke): весь личный диалог у обоих собеседников
+REVOKE_HISTORY = 'revoke_history'
+
+STRATEGY_NAMES = {
+    ID_BATCHES: "пачки по 100 id",
+    PARTICIPANT_HISTORY: "очистка истории участника",
+    REVOKE_HISTORY: "очистка диалога у обоих"
+}
+
+
+class DeletionStrategies:
+    """Подбирает и выполняет способ удаления по типу чата, правам и области.
+
+    - В супергруппе, где у вас есть право удалять сообщения, все ваши
+      сообщения удаляются одним запросом channels.deleteParticipantHistory.
+    - Личный диалог за все время можно очистить у обоих собеседников через
+      messages.deleteHistory(revoke=True). Это удаляет и сообщения
+      собеседника, поэтому способ выбирается только с явного согласия.
+    - Во всех остальных случаях (период, обычные группы, каналы без прав)
+      используется удаление пачками по id.
+
+    id_batches_only=True оставляет только удаление пачками: например, при
+    архивировании каждое сообщение должно пройти через архив перед удалением.
+    """
+
+    def __init__(self, client, limiter=None, id_batches_only=False):
+        self.client = client
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.id_batches_only = id_batches_only
+
+    def choose(self, chat, selection=None, allow_revoke_history=False):
+        """Стратегия для чата с учетом области удаления (selection)"""
+        if self.id_batches_only or (selection is not None and not selection.is_all):
+            return ID_BATCHES
+
+        entity = chat['entity']
+        if isinstance(entity, types.InputPeerChannel) and chat.get('type') == GROUP and chat.get('can_delete'):
+            return PARTICIPANT_HISTORY
+        if isinstance(entity, (types.InputPeerUser, types.InputPeerSelf)) and allow_revoke_history:
+            return REVOKE_HISTORY
+        return ID_BATCHES
+
+    async def _repeat_until_done(self, method, request):
+        # Оба метода удаляют историю частями и возвращают offset, пока что-то осталось
+        deleted_count = 0
+        while True:
+            result = await self.limiter.call(method, self.client, request)
+            deleted_count += result.pts_count
+            if not result.offset:
+                return deleted_count
+
+    async def execute(self, strategy, chat):
+        """Выполняет стратегию без поиска сообщений. Возвращает число удаленных"""
+        peer = await self.client.get_input_entity(chat['entity'])
+
+        if strategy == PARTICIPANT_HISTORY:
+            request = DeleteParticipantHistoryRequest(channel=peer, participant=types.InputPeerSelf())
+            return await self._repeat_until_done(CHANNEL_DELETE_PARTICIPANT_HISTORY, request)
+
+        if strategy == REVOKE_HISTORY:
+            request = DeleteHistoryRequest(peer=peer, max_id=0, revoke=True)
+            return await self._repeat_until_done(DELETE_HISTORY, request)
+
+        raise ValueError(f"Стратегия {strategy} выполняется через удаление пачками")
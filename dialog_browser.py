@@ -0,0 +1,163 @@
+"""Постраничный просмотр диалогов с фильтрами для аккаунтов с тысячами чатов"""
+import time
+from telethon.tl import types
+from rate_limiter import GET_DIALOGS
+from dialog_index import dialog_record
+
+# Сколько чатов показывать на странице
+PAGE_SIZE = 20
+# Сколько диалогов запрашивать за раз (больше Telegram не отдает)
+FETCH_SIZE = 100
+
+
+def parse_ranges(text, maximum):
+    """Номера из строки вида "1-3,5 8" (от 1 до maximum) в порядке возрастания.
+
+    ValueError, если строка не разбирается или номер вне диапазона.
+    """
+    numbers = set()
+    for part in text.replace(',', ' ').split():
+        first, _, last = part.partition('-')
+        if not first.isdigit() or not (last or first).isdigit():
+            raise ValueError(f"ожидается номер или диапазон, например 1-3: {part}")
+        first = int(first)
+        last = int(last) if last else first
+        if first > last:
+            first, last = last, first
+        if first < 1 or last > maximum:
+            raise ValueError(f"номер вне диапазона 1-{maximum}: {part}")
+        numbers.update(range(first, last + 1))
+    if not numbers:
+        raise ValueError("не указано ни одного номера")
+    return sorted(numbers)
+
+
+class DialogFilter:
+    """Условия отбора чатов: часть названия, типы, только непрочитанные, активность за дни"""
+
+    def __init__(self, name=None, chat_types=(), unread=False, active_days=None):
+        self.name = name
+        self.chat_types = set(chat_types)
+        self.unread = unread
+        self.active_days = active_days
+
+    @property
+    def since(self):
+        """Граница активности (unix time) или 0"""
+        return time.time() - self.active_days * 24 * 60 * 60 if self.active_days else 0
+
+    def matches(self, chat, since=0):
+        if self.chat_types and chat['type'] not in self.chat_types:
+            return False
+        if self.unread and not chat['unread']:
+            return False
+        if since and chat['date'] < since:
+            return False
+        return not self.name or self.name.lower() in (chat['name'] or '').lower()
+
+    def describe(self, type_names=None):
+        """Описание фильтра для пользователя ("" - без фильтра)"""
+        type_names = type_names or {}
+        parts = []
+        if self.name:
+            parts.append(f"название содержит \"{self.name}\"")
+        if self.chat_types:
+            parts.append("типы: " + ", ".join(sorted(type_names.get(t, t) for t in self.chat_types)))
+        if self.unread:
+            parts.append("непрочитанные")
+        if self.active_days:
+            parts.append(f"активные за {self.active_days} дн.")
+        return "; ".join(parts)
+
+
+class DialogPager:
+    """Чаты под фильтром, загружаемые по мере листания.
+
+    Если индекс диалогов уже загружен (в этом запуске или из DIALOG_CACHE),
+    страницы строятся из него без запросов. Иначе диалоги запрашиваются
+    по FETCH_SIZE штук от самых свежих (messages.getDialogs со смещением
+    по дате, id сообщения и чату последнего полученного диалога) и только
+    тогда, когда для страницы не хватает подходящих чатов, поэтому первая
+    страница без фильтра появляется после одного запроса. Диалоги идут по
+    убыванию даты, так что с фильтром активности загрузка останавливается
+    на первом слишком старом диалоге.
+    """
+
+    def __init__(self, client, limiter, index=None, dialog_filter=None, page_size=PAGE_SIZE):
+        self.client = client
+        self.limiter = limiter
+        self.index = index
+        self.filter = dialog_filter or DialogFilter()
+        self.page_size = page_size
+        self.since = self.filter.since
+        self.chats = []
+        self.total = None
+        self.done = False
+        self.requests = 0
+        self._started = False
+        self._seen = set()
+        self._offset_date = None
+        self._offset_id = 0
+        self._offset_peer = types.InputPeerEmpty()
+
+    async def _from_index(self):
+        chats = await self.index.select(*self.filter.chat_types)
+        self.chats = [chat for chat in chats if self.filter.matches(chat, self.since)]
+        self.total = len(self.index.chats)
+        self.done = True
+
+    async def _fetch(self):
+        dialogs = await self.limiter.call(
+            GET_DIALOGS, self.client.get_dialogs, limit=FETCH_SIZE,
+            offset_date=self._offset_date, offset_id=self._offset_id, offset_peer=self._offset_peer
+        )
+        self.requests += 1
+        self.total = getattr(dialogs, 'total', None) or self.total
+        if len(dialogs) < FETCH_SIZE:
+            self.done = True
+
+        oldest = None
+        seen = len(self._seen)
+        for dialog in dialogs:
+            # Закрепленные диалоги идут первыми вне порядка дат
+            if not getattr(dialog, 'pinned', False) and dialog.date:
+                oldest = dialog.date.timestamp()
+            if dialog.id in self._seen:
+                continue
+            self._seen.add(dialog.id)
+            chat = dialog_record(dialog)
+            if self.filter.matches(chat, self.since):
+                self.chats.append(chat)
+
+        if len(self._seen) == seen:
+            # Смещение больше не двигается
+            self.done = True
+            return
+        last = dialogs[-1]
+        self._offset_date = last.date
+        self._offset_id = getattr(last.message, 'id', 0)
+        self._offset_peer = last.input_entity
+        if self.since and oldest is not None and oldest < self.since:
+            self.done = True
+
+    async def page(self, number):
+        """Чаты страницы number (с нуля); подгружает диалоги, пока их не хватает"""
+        if not self._started:
+            self._started = True
+            if self.index is not None and self.index.is_loaded():
+                await self._from_index()
+
+        end = (number + 1) * self.page_size
+        while len(self.chats) < end and not self.done:
+            await self._fetch()
+        return self.chats[number * self.page_size:end]
+
+    async def all(self):
+        """Все чаты под фильтром (догружает оставшиеся диалоги)"""
+        await self.page(0)
+        while not self.done:
+            await self._fetch()
+        return self.chats
+
+    def has_next(self, number):
+        return not self.done or len(self.chats) > (number + 1) * self.page_size
@@ -0,0 +1,246 @@
+"""Кэш диалогов аккаунта: загружается один раз и дальше обновляется по дате"""
+import json
+import os
+import time
+from telethon.tl import types
+from rate_limiter import AdaptiveRateLimiter, GET_DIALOGS
+
+# Типы чатов в индексе
+USER = 'user'
+BOT = 'bot'
+GROUP = 'group'
+CHANNEL = 'channel'
+
+# Как часто проверять новые диалоги (одним запросом), в секундах
+REFRESH_INTERVAL = 60
+# Через сколько секунд индекс загружается заново целиком
+CACHE_TTL = 6 * 60 * 60
+# Версия формата файла кэша
+CACHE_VERSION = 2
+
+
+def _dialog_type(entity):
+    if isinstance(entity, types.User):
+        return BOT if entity.bot else USER
+    if isinstance(entity, types.Channel) and not entity.megagroup:
+        return CHANNEL
+    return GROUP
+
+
+def _can_delete_messages(entity):
+    """Есть ли у вас право удалять чужие сообщения (создатель или админ с правом удаления)"""
+    if getattr(entity, 'creator', False):
+        return True
+    rights = getattr(entity, 'admin_rights', None)
+    return bool(rights and rights.delete_messages)
+
+
+def dialog_record(dialog):
+    """Запись индекса для диалога Telethon"""
+    return {
+        'name': dialog.title,
+        'id': dialog.id,
+        'entity': dialog.input_entity,
+        'type': _dialog_type(dialog.entity),
+        'date': dialog.date.timestamp() if dialog.date else 0,
+        'unread': dialog.unread_count,
+        'can_delete': _can_delete_messages(dialog.entity)
+    }
+
+
+def _peer_to_json(peer):
+    if isinstance(peer, types.InputPeerUser):
+        return {'kind': 'user', 'id': peer.user_id, 'access_hash': peer.access_hash}
+    if isinstance(peer, types.InputPeerChannel):
+        return {'kind': 'channel', 'id': peer.channel_id, 'access_hash': peer.access_hash}
+    if isinstance(peer, types.InputPeerChat):
+        return {'kind': 'chat', 'id': peer.chat_id}
+    return {'kind': 'self'}
+
+
+def _peer_from_json(data):
+    if data['kind'] == 'user':
+        return types.InputPeerUser(data['id'], data['access_hash'])
+    if data['kind'] == 'channel':
+        return types.InputPeerChannel(data['id'], data['access_hash'])
+    if data['kind'] == 'chat':
+        return types.InputPeerChat(data['id'])
+    return types.InputPeerSelf()
+
+
+class DialogIndex:
+    """Индекс диалогов с выборками по типам (личные, боты, группы, каналы).
+
+    Полный список диалогов скачивается только при первом обращении (или
+    когда истек CACHE_TTL). Дальше не чаще раза в REFRESH_INTERVAL
+    запрашиваются лишь диалоги с новыми сообщениями: обход идет от самых
+    свежих и останавливается на первом диалоге, который уже был в индексе
+    с той же датой. Если задан cache_path, индекс сохраняется на диск и
+    переживает перезапуск.
+
+    Записи индекса - словари {'name', 'id', 'entity', 'type', 'date', 'unread',
+    'can_delete'}, где entity - InputPeer, достаточный для всех запросов к
+    чату, а can_delete - право удалять сообщения других участников.
+    """
+
+    def __init__(self, client, limiter=None, cache_path=None, ttl=CACHE_TTL,
+                 refresh_interval=REFRESH_INTERVAL):
+        self.client = client
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.chats = {}
+        self.by_type = {USER: set(), BOT: set(), GROUP: set(), CHANNEL: set()}
+        self.newest_date = 0
+        self.loaded_at = 0
+        self.synced_at = 0
+
+    def _add(self, dialog):
+        chat = dialog_record(dialog)
+        old = self.chats.get(chat['id'])
+        if old:
+            self.by_type[old['type']].discard(chat['id'])
+        self.chats[chat['id']] = chat
+        self.by_type[chat['type']].add(chat['id'])
+        self.newest_date = max(self.newest_date, chat['date'])
+
+    async def _load_all(self):
+        dialogs = await self.limiter.call(GET_DIALOGS, self.client.get_dialogs)
+        self.chats = {}
+        self.by_type = {chat_type: set() for chat_type in self.by_type}
+        self.newest_date = 0
+        for dialog in dialogs:
+            self._add(dialog)
+        self.loaded_at = self.synced_at = time.time()
+
+    async def _fetch_updated(self):
+        # Диалоги идут от самых свежих, но закрепленные - первыми вне порядка дат: их
+        # (их немного) обновляем всегда, а остановку по дате проверяем только у остальных
+        updated = []
+        async for dialog in self.client.iter_dialogs():
+            if getattr(dialog, 'pinned', False):
+                updated.append(dialog)
+                continue
+            date = dialog.date.timestamp() if dialog.date else 0
+            known = self.chats.get(dialog.id)
+            if date <= self.newest_date and known and known['date'] >= date:
+                break
+            updated.append(dialog)
+        return updated
+
+    async def _load_updates(self):
+        updated = await self.limiter.call(GET_DIALOGS, self._fetch_updated)
+        for dialog in updated:
+            self._add(dialog)
+        self.synced_at = time.time()
+
+    def dump(self):
+        """Снимок индекса в виде JSON-совместимого словаря (None, если индекс пуст)"""
+        if not self.chats:
+            return None
+        return {
+            'version': CACHE_VERSION,
+            'loaded_at': self.loaded_at,
+            'synced_at': self.synced_at,
+            'newest_date': self.newest_date,
+            'chats': [dict(chat, entity=_peer_to_json(chat['entity'])) for chat in self.chats.values()]
+        }
+
+    def restore(self, data):
+        """Загружает снимок из dump(). Возвращает False, если он устарел или другой версии"""
+        if not data or data.get('version') != CACHE_VERSION or time.time() - data['loaded_at'] > self.ttl:
+            return False
+
+        for chat in data['chats']:
+            chat = dict(chat, entity=_peer_from_json(chat['entity']))
+            self.chats[chat['id']] = chat
+            self.by_type[chat['type']].add(chat['id'])
+        self.newest_date = data['newest_date']
+        self.loaded_at = data['loaded_at']
+        self.synced_at = data['synced_at']
+        return True
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return self.restore(data)
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        data = self.dump()
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    async def refresh(self, force=False):
+        """Обновляет индекс: целиком, если он пуст или устарел, иначе только новые диалоги"""
+        now = time.time()
+        if not self.chats and not force:
+            self._load_cache()
+
+        if force or not self.chats or now - self.loaded_at > self.ttl:
+            await self._load_all()
+        elif now - self.synced_at > self.refresh_interval:
+            await self._load_updates()
+        else:
+            return
+
+        self._save_cache()
+
+    def is_loaded(self):
+        """Есть ли свежий полный индекс (из памяти или кэша): тогда выборки не загружают все диалоги"""
+        if not self.chats:
+            self._load_cache()
+        return bool(self.chats) and time.time() - self.loaded_at <= self.ttl
+
+    async def select(self, *chat_types):
+        """Чаты указанных типов (или все), от самых свежих к старым"""
+        await self.refresh()
+        if chat_types:
+            ids = set().union(*(self.by_type[chat_type] for chat_type in chat_types))
+            chats = [self.chats[chat_id] for chat_id in ids]
+        else:
+            chats = list(self.chats.values())
+        return sorted(chats, key=lambda chat: chat['date'], reverse=True)
+
+    async def get(self, chat_id):
+        await self.refresh()
+        return self.chats.get(chat_id)
+
+    async def users(self):
+        return await self.select(USER)
+
+    async def bots(self):
+        return await self.select(BOT)
+
+    async def groups(self):
+        return await self.select(GROUP)
+
+    async def channels(self):
+        return await self.select(CHANNEL)
+
+    def invalidate(self):
+        """Заставляет следующее обращение загрузить индекс заново"""
+        self.loaded_at = 0
+
+    def mark_stale(self):
+        """Заставляет следующее обращение проверить новые диалоги, не дожидаясь REFRESH_INTERVAL"""
+        self.synced_at = 0
+
+    def clear(self):
+        """Очищает индекс и удаляет его файл кэша"""
+        self.chats = {}
+        self.by_type = {chat_type: set() for chat_type in self.by_type}
+        self.newest_date = self.loaded_at = self.synced_at = 0
+        if self.cache_path:
+            for path in (self.cache_path, self.cache_path + '.tmp'):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,79 @@
+"""Поиск чатов, в которых вообще есть ваши сообщения"""
+import asyncio
+import math
+from telethon import utils
+from telethon.tl import types
+
+# Сколько чатов проверяется одновременно
+CONCURRENCY = 4
+# Сколько запросов уходит на проверку одного чата (scanner.probe)
+PROBE_REQUESTS = 2
+
+
+class OwnMessageDiscovery:
+    """Находит чаты с вашими сообщениями до того, как обходить каждый из них.
+
+    Каждый чат можно проверить запросом со счетчиком (и еще одним, если
+    сообщения есть, чтобы узнать самое старое). Личные диалоги и обычные
+    группы можно проверить и одним общим поиском по всему аккаунту, но он
+    обходит все ваши сообщения в таких чатах, а не только в выбранных
+    (запросов столько, сколько их / 100). Поэтому сначала одним запросом
+    узнается их общее число, и общий поиск используется, только если он
+    дешевле проверки выбранных чатов по одному. Супергруппы и каналы в
+    общий поиск не входят и всегда проверяются по одному. Дальше полная
+    обработка нужна только чатам с ненулевым счетчиком.
+
+    В личных диалогах сервер не фильтрует по отправителю, поэтому при
+    проверке по одному счетчик там - оценка сверху, а границы id -
+    границы всех сообщений диалога за период.
+    """
+
+    def __init__(self, scanner, concurrency=CONCURRENCY):
+        self.scanner = scanner
+        self.concurrency = max(1, concurrency)
+
+    @staticmethod
+    def _record(found, chat_id, message_id):
+        info = found.setdefault(chat_id, {'count': 0, 'newest_id': message_id, 'oldest_id': message_id})
+        info['count'] += 1
+        info['newest_id'] = max(info['newest_id'], message_id)
+        info['oldest_id'] = min(info['oldest_id'], message_id)
+
+    async def _discover_common(self, wanted, selection, found):
+        async for page in self.scanner.iter_common_pages(selection):
+            for message in page:
+                chat_id = utils.get_peer_id(message.peer_id)
+                if chat_id in wanted:
+                    self._record(found, chat_id, message.id)
+
+    async def _common_search_pays_off(self, chats_count, selection):
+        """Дешевле ли общий поиск, чем проверка chats_count чатов по одному"""
+        total = await self.scanner.server_count(types.InputPeerEmpty(), selection)
+        return math.ceil(total / self.scanner.page_size) < PROBE_REQUESTS * chats_count
+
+    async def _probe_each(self, chats, selection, found):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(chat):
+            async with semaphore:
+                count, newest_id, oldest_id = await self.scanner.probe(chat['entity'], selection)
+                if count:
+                    found[chat['id']] = {'count': count, 'newest_id': newest_id, 'oldest_id': oldest_id}
+
+        await asyncio.gather(*(probe(chat) for chat in chats))
+
+    async def discover(self, chats, selection=None):
+        """Словарь {id чата: {'count', 'newest_id', 'oldest_id'}} только для чатов с вашими сообщениями"""
+        found = {}
+        channels = [chat for chat in chats if isinstance(chat['entity'], types.InputPeerChannel)]
+        common = [chat for chat in chats if not isinstance(chat['entity'], types.InputPeerChannel)]
+
+        tasks, probed = [], channels
+        if common and await self._common_search_pays_off(len(common), selection):
+            tasks.append(self._discover_common({chat['id'] for chat in common}, selection, found))
+        else:
+            probed = channels + common
+        tasks.append(self._probe_each(probed, selection, found))
+        await asyncio.gather(*tasks)
+
+        return found
@@ -0,0 +1,25 @@
+"""Служебные события очистки: FloodWait, ошибки пачек, переход с takeout и т.п.
+
+Модули не печатают такие сообщения сами, а передают их в журнал
+tg_cleaner с именем события и полями. В интерактивном режиме
+print_events() выводит текст событий в консоль, а job_runner пишет их в
+свой журнал (в том числе в JSON) вместе с остальными событиями задания.
+"""
+import logging
+import sys
+
+logger = logging.getLogger('tg_cleaner')
+
+
+def report(event, text, level=logging.INFO, **fields):
+    """Сообщает о событии: text - для человека, event и fields - для журнала"""
+    logger.log(level, text, extra={'event': event, 'fields': fields})
+
+
+def print_events():
+    """Печатать текст событий в stdout, как остальной вывод программы"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,241 @@
+"""Фоновое автоудаление ваших сообщений через заданное время (TTL)"""
+import asyncio
+import datetime
+import logging
+import sqlite3
+import time
+from telethon import events
+from message_scanner import MessageSelection
+from id_set import MessageIdSet
+from checkpoint_store import STATE_PATH
+from events import report
+
+# Сообщения, срок которых истекает в пределах этого окна, удаляются одним запросом, в секундах
+COALESCE_DELAY = 2.0
+# Максимальная пауза между проверками очереди, в секундах
+MAX_SLEEP = 60.0
+# Сколько сообщений забирается из очереди за один проход
+DUE_LIMIT = 10_000
+# Через сколько секунд повторить сообщения, не удаленные из-за ошибки
+RETRY_DELAY = 60.0
+
+
+class ExpiryQueue:
+    """Очередь сообщений на удаление, упорядоченная по времени истечения (SQLite).
+
+    Индекс по expire_at дает выборку ближайших сообщений и вставку за
+    O(log n), поэтому очередь спокойно держит десятки тысяч сообщений и
+    переживает перезапуск. Для каждого чата хранится курсор - самый новый
+    id, который уже попал в очередь: после перезапуска пропущенные сообщения
+    ищутся только выше него.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS expiry (
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                expire_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, message_id)
+            );
+            CREATE INDEX IF NOT EXISTS expiry_at ON expiry (expire_at);
+            CREATE TABLE IF NOT EXISTS expiry_cursors (
+                chat_id INTEGER PRIMARY KEY,
+                last_id INTEGER NOT NULL
+            );
+        ''')
+        self.db.commit()
+
+    def push(self, chat_id, messages):
+        """Добавляет сообщения [(id, expire_at), ...] одного чата и сдвигает его курсор"""
+        if not messages:
+            return
+        last_id = max(message_id for message_id, _ in messages)
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO expiry (chat_id, message_id, expire_at) VALUES (?, ?, ?)',
+                [(chat_id, message_id, expire_at) for message_id, expire_at in messages]
+            )
+            self.db.execute(
+                'INSERT INTO expiry_cursors (chat_id, last_id) VALUES (?, ?) '
+                'ON CONFLICT (chat_id) DO UPDATE SET last_id = MAX(last_id, excluded.last_id)',
+                (chat_id, last_id)
+            )
+
+    def cursor(self, chat_id):
+        row = self.db.execute('SELECT last_id FROM expiry_cursors WHERE chat_id = ?', (chat_id,)).fetchone()
+        return row[0] if row else 0
+
+    def due(self, until, limit=DUE_LIMIT):
+        """Сообщения, срок которых истекает не позже until: {id чата: [id, ...]}"""
+        rows = self.db.execute(
+            'SELECT chat_id, message_id FROM expiry WHERE expire_at <= ? ORDER BY expire_at LIMIT ?',
+            (until, limit)
+        ).fetchall()
+        due = {}
+        for chat_id, message_id in rows:
+            due.setdefault(chat_id, []).append(message_id)
+        return due
+
+    def next_expire_at(self):
+        row = self.db.execute('SELECT MIN(expire_at) FROM expiry').fetchone()
+        return row[0]
+
+    def remove(self, chat_id, message_ids):
+        with self.db:
+            self.db.executemany(
+                'DELETE FROM expiry WHERE chat_id = ? AND message_id = ?',
+                [(chat_id, message_id) for message_id in message_ids]
+            )
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM expiry').fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+class AutoExpireDaemon:
+    """Удаляет ваши сообщения, когда истекает их срок жизни.
+
+    Срок задается словарем ttls: ключ - id чата или тип чата (USER, BOT,
+    GROUP, CHANNEL), значение - секунды; id чата важнее типа. Новые
+    исходящие сообщения приходят событием NewMessage(outgoing=True) и сразу
+    попадают в очередь, так что история не пересматривается. При запуске
+    догоняются только сообщения, отправленные, пока демон не работал: выше
+    курсора очереди (и границы уже очищенной истории из CheckpointStore), а
+    для нового чата - только за последние TTL секунд. Истекшие сообщения
+    одного чата удаляются общими пачками.
+    """
+
+    def __init__(self, client, scanner, pipeline, dialogs, queue, ttls, checkpoints=None):
+        self.client = client
+        self.scanner = scanner
+        self.pipeline = pipeline
+        self.dialogs = dialogs
+        self.queue = queue
+        self.ttls = ttls
+        self.checkpoints = checkpoints
+        self.wakeup = asyncio.Event()
+        self.deleted = 0
+
+    def ttl_for(self, chat):
+        return self.ttls.get(chat['id'], self.ttls.get(chat['type']))
+
+    async def _find_chat(self, chat_id):
+        chat = self.dialogs.chats.get(chat_id)
+        if chat is None:
+            # Новый диалог: индекс догружает только свежие диалоги
+            self.dialogs.mark_stale()
+            chat = await self.dialogs.get(chat_id)
+        return chat
+
+    async def _on_new_message(self, event):
+        chat = await self._find_chat(event.chat_id)
+        if chat is None:
+            return
+        ttl = self.ttl_for(chat)
+        if ttl is None:
+            return
+
+        message = event.message
+        self.queue.push(chat['id'], [(message.id, message.date.timestamp() + ttl)])
+        self.wakeup.set()
+
+    async def catch_up(self):
+        """Ставит в очередь сообщения, отправленные, пока демон был остановлен"""
+        chats = [chat for chat in await self.dialogs.select() if self.ttl_for(chat) is not None]
+        added = 0
+
+        for chat in chats:
+            ttl = self.ttl_for(chat)
+            min_id = self.queue.cursor(chat['id'])
+            if self.checkpoints:
+                min_id = max(min_id, self.checkpoints.swept_max_id(chat['id']))
+
+            selection = None
+            if not min_id:
+                # Чат еще не отслеживался: более старые сообщения - задача обычной очистки
+                now = datetime.datetime.now(datetime.timezone.utc)
+                selection = MessageSelection(min_date=now - datetime.timedelta(seconds=ttl))
+
+            try:
+                async for page in self.scanner.iter_pages(chat['entity'], min_id, 0, selection):
+                    self.queue.push(chat['id'], [(m.id, m.date.timestamp() + ttl) for m in page])
+                    added += len(page)
+            except Exception as e:
+                report('expire_catch_up_failed', f"⚠️ {chat['name']}: не удалось проверить пропущенные сообщения ({e})",
+                       logging.WARNING, chat_id=chat['id'], error=str(e))
+
+        return len(chats), added
+
+    async def _expire(self, chat_id, message_ids):
+        chat = await self._find_chat(chat_id)
+        stats = None
+        failed = []
+        if chat is not None:
+            selected = MessageIdSet()
+            selected.ids.extend(message_ids)
+            try:
+                stats = await self.pipeline.run(
+                    chat['entity'], selected, on_progress=lambda count: None, on_failed=failed.extend
+                )
+            except Exception as e:
+                report('expire_failed', f"⚠️ {chat['name']}: не удалось удалить истекшие сообщения ({e})",
+                       logging.WARNING, chat_id=chat_id, error=str(e))
+                failed = list(message_ids)
+
+        # Удаленные и неудаляемые сообщения (и сообщения чатов, которых больше нет) уходят из
+        # очереди. Курсор чата уже выше не удаленных из-за ошибки, и catch_up() их не найдет,
+        # поэтому они остаются в очереди с новым сроком и повторяются позже
+        failed_ids = set(failed)
+        self.queue.remove(chat_id, [message_id for message_id in message_ids if message_id not in failed_ids])
+        if failed:
+            retry_at = time.time() + RETRY_DELAY
+            self.queue.push(chat_id, [(message_id, retry_at) for message_id in failed])
+
+        if stats is not None:
+            self.deleted += stats['deleted']
+            report('expired_deleted', f"⏱ Удалено {stats['deleted']} сообщений в чате {chat['name']} "
+                   f"(в очереди: {len(self.queue)})", chat_id=chat_id, deleted=stats['deleted'],
+                   skipped=stats['skipped'], pending=len(self.queue))
+            if stats['skipped']:
+                report('expired_skipped', f"⚠️ {chat['name']}: {stats['skipped']} сообщений удалить нельзя, "
+                       f"они пропущены", logging.WARNING, chat_id=chat_id, count=stats['skipped'])
+        if failed:
+            report('expired_retry', f"⚠️ {chat['name']}: {len(failed)} сообщений не удалено из-за ошибки, "
+                   f"повтор через {RETRY_DELAY:.0f} с", logging.WARNING, chat_id=chat_id, count=len(failed),
+                   delay=RETRY_DELAY)
+
+    async def _expire_loop(self):
+        while True:
+            now = time.time()
+            due = self.queue.due(now + COALESCE_DELAY)
+            if due:
+                for chat_id, message_ids in due.items():
+                    await self._expire(chat_id, message_ids)
+                continue
+
+            next_at = self.queue.next_expire_at()
+            timeout = MAX_SLEEP if next_at is None else min(MAX_SLEEP, max(0.0, next_at - now))
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Работает, пока задачу не отменят"""
+        handler = self._on_new_message
+        self.client.add_event_handler(handler, events.NewMessage(outgoing=True))
+        try:
+            chats, added = await self.catch_up()
+            report('expire_started', f"⏱ Автоудаление включено для {chats} чатов, найдено пропущенных "
+                   f"сообщений: {added}, в очереди: {len(self.queue)}", chats=chats, added=added, pending=len(self.queue))
+            await self._expire_loop()
+        finally:
+            self.client.remove_event_handler(handler)
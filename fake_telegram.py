@@ -0,0 +1,325 @@
+"""Локальная замена TelegramClient для замеров: синтетические чаты без сети и аккаунта"""
+import asyncio
+import datetime
+import random
+import time
+from telethon import errors, utils
+from telethon.helpers import TotalList
+from telethon.tl import types
+from telethon.tl.functions.messages import SearchRequest, DeleteHistoryRequest
+from telethon.tl.functions.channels import DeleteParticipantHistoryRequest
+from rate_limiter import (
+    SEARCH, GET_DIALOGS, GET_MESSAGES, DELETE_MESSAGES, CHANNEL_DELETE_MESSAGES,
+    CHANNEL_DELETE_PARTICIPANT_HISTORY, DELETE_HISTORY
+)
+
+# Типы синтетических чатов
+CHANNEL = 'channel'
+USER = 'user'
+GROUP = 'group'
+
+# Сколько сообщений сервер удаляет за один запрос очистки истории
+HISTORY_CHUNK = 1000
+# Дата первого сообщения и интервал между сообщениями
+START_DATE = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+MESSAGE_INTERVAL = datetime.timedelta(minutes=1)
+
+
+class SyntheticChat:
+    """Чат из size сообщений с id first_id..first_id + size - 1.
+
+    Ваше каждое own_every-е сообщение. Сами сообщения не хранятся: они
+    создаются при выдаче, а удаленные отмечаются в bytearray (1 байт на
+    сообщение), поэтому чат на миллион сообщений занимает около мегабайта.
+    """
+
+    def __init__(self, index, kind, size, own_every=1, first_id=1):
+        self.kind = kind
+        self.size = size
+        self.own_every = max(1, own_every)
+        self.first_id = first_id
+        self.deleted = bytearray(size)
+        self.title = f"{kind} {index}"
+        self.pinned = False
+        if kind == CHANNEL:
+            self.input_peer = types.InputPeerChannel(1000 + index, index)
+            self.entity = types.Channel(1000 + index, self.title, types.ChatPhotoEmpty(), START_DATE,
+                                        megagroup=True, access_hash=index)
+        elif kind == GROUP:
+            self.input_peer = types.InputPeerChat(1000 + index)
+            self.entity = types.Chat(1000 + index, self.title, types.ChatPhotoEmpty(), 2, START_DATE, 1)
+        else:
+            self.input_peer = types.InputPeerUser(1000 + index, index)
+            self.entity = types.User(1000 + index, access_hash=index, first_name=self.title, bot=False)
+        self.peer = utils.get_peer(self.input_peer)
+        self.id = utils.get_peer_id(self.input_peer)
+
+    @property
+    def last_id(self):
+        return self.first_id + self.size - 1
+
+    def is_own(self, message_id):
+        return (message_id - self.first_id) % self.own_every == 0
+
+    def is_deleted(self, message_id):
+        return self.deleted[message_id - self.first_id]
+
+    def date(self, message_id):
+        return START_DATE + (message_id - self.first_id) * MESSAGE_INTERVAL
+
+    def message(self, message_id):
+        return types.Message(
+            id=message_id, peer_id=self.peer, date=self.date(message_id),
+            message=f"message {message_id}", out=self.is_own(message_id)
+        )
+
+    def _id_for_date(self, date):
+        return self.first_id + int((date - START_DATE) / MESSAGE_INTERVAL)
+
+    def own_left(self):
+        # Ваши сообщения - каждый own_every-й байт начиная с нулевого
+        return self.deleted[::self.own_every].count(0)
+
+    def search(self, offset_id, limit, add_offset=0, min_date=None, max_date=None, own_only=True):
+        """Сообщения от новых к старым, как messages.search. Возвращает (count, messages)"""
+        high = self.last_id
+        if offset_id:
+            high = min(high, offset_id - 1)
+        # Границы по дате приблизительные (до минуты): точно период проверяет сам сканер
+        if max_date:
+            high = min(high, self._id_for_date(max_date))
+        low = self.first_id
+        if min_date:
+            low = max(low, self._id_for_date(min_date))
+
+        step = self.own_every if own_only else 1
+        if own_only:
+            # Начинаем с ближайшего вашего сообщения не выше high
+            high -= (high - self.first_id) % step
+
+        messages = []
+        skip = add_offset
+        for message_id in range(high, low - 1, -step):
+            if self.is_deleted(message_id):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if len(messages) >= limit:
+                break
+            messages.append(self.message(message_id))
+
+        count = self._count(low, high, step)
+        return count, messages
+
+    def _count(self, low, high, step):
+        if high < low:
+            return 0
+        return self.deleted[high - self.first_id:low - self.first_id - 1 if low > self.first_id else None:-step].count(0)
+
+    def delete(self, message_ids):
+        deleted = 0
+        for message_id in message_ids:
+            offset = message_id - self.first_id
+            if 0 <= offset < self.size and not self.deleted[offset]:
+                self.deleted[offset] = 1
+                deleted += 1
+        return deleted
+
+
+class FakeServer:
+    """Лимиты и задержки сервера: RTT, предел скорости по методам и случайные FloodWait.
+
+    flood_limits - {метод: запросов в секунду}; если запросы метода идут
+    чаще, сервер отвечает FloodWait на flood_seconds. flood_probability -
+    вероятность FloodWait на любой запрос.
+    """
+
+    def __init__(self, rtt=0.0, flood_limits=None, flood_probability=0.0, flood_seconds=1, seed=0):
+        self.rtt = rtt
+        self.flood_limits = flood_limits or {}
+        self.flood_probability = flood_probability
+        self.flood_seconds = flood_seconds
+        self.random = random.Random(seed)
+        self.last_call = {}
+        self.requests = {}
+        self.flood_waits = 0
+
+    async def handle(self, method):
+        self.requests[method] = self.requests.get(method, 0) + 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+
+        now = time.monotonic()
+        limit = self.flood_limits.get(method)
+        too_fast = limit and now - self.last_call.get(method, 0.0) < 1.0 / limit
+        if too_fast or (self.flood_probability and self.random.random() < self.flood_probability):
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+        self.last_call[method] = now
+
+
+class FakeTelegramClient:
+    """Минимальная замена TelegramClient для OwnMessageScanner, DeletionPipeline,
+    DialogIndex, DialogPager, DeletionStrategies и MessageArchive.
+
+    Поддерживает client(SearchRequest | DeleteParticipantHistoryRequest |
+    DeleteHistoryRequest), get_dialogs, iter_dialogs, get_messages,
+    delete_messages и get_input_entity. Личные диалоги и обычные группы
+    делят общую нумерацию id, как на настоящем сервере, поэтому работает и
+    поиск по всему аккаунту (peer=InputPeerEmpty).
+    """
+
+    def __init__(self, chats, server=None):
+        self.chats = {chat.id: chat for chat in chats}
+        self.server = server or FakeServer()
+
+    @classmethod
+    def build(cls, layout, server=None):
+        """Клиент с чатами из списка [(тип, число сообщений, каждое какое ваше), ...]"""
+        chats = []
+        next_common_id = 1
+        for index, (kind, size, own_every) in enumerate(layout):
+            if kind == CHANNEL:
+                chats.append(SyntheticChat(index, kind, size, own_every))
+            else:
+                chats.append(SyntheticChat(index, kind, size, own_every, first_id=next_common_id))
+                next_common_id += size
+        return cls(chats, server)
+
+    def _chat(self, peer):
+        return self.chats[utils.get_peer_id(peer)]
+
+    def _chat_for_common_id(self, message_id):
+        for chat in self.chats.values():
+            if chat.kind != CHANNEL and chat.first_id <= message_id <= chat.last_id:
+                return chat
+        return None
+
+    @property
+    def requests(self):
+        return sum(self.server.requests.values())
+
+    def own_left(self):
+        return sum(chat.own_left() for chat in self.chats.values())
+
+    async def get_input_entity(self, entity):
+        if isinstance(entity, (types.InputPeerChannel, types.InputPeerUser, types.InputPeerChat,
+                               types.InputPeerEmpty, types.InputPeerSelf)):
+            return entity
+        return self.chats[entity].input_peer
+
+    async def __call__(self, request, ordered=False):
+        if isinstance(request, SearchRequest):
+            await self.server.handle(SEARCH)
+            return self._search(request)
+        if isinstance(request, DeleteParticipantHistoryRequest):
+            await self.server.handle(CHANNEL_DELETE_PARTICIPANT_HISTORY)
+            return self._delete_history(self._chat(request.channel), own_only=True)
+        if isinstance(request, DeleteHistoryRequest):
+            await self.server.handle(DELETE_HISTORY)
+            return self._delete_history(self._chat(request.peer), own_only=False)
+        raise NotImplementedError(type(request).__name__)
+
+    def _search(self, request):
+        own_only = isinstance(request.from_id, types.InputPeerSelf)
+        if isinstance(request.peer, types.InputPeerEmpty):
+            return self._search_common(request, own_only)
+
+        chat = self._chat(request.peer)
+        # В личных диалогах сервер игнорирует from_id
+        count, messages = chat.search(
+            request.offset_id, request.limit, request.add_offset, request.min_date, request.max_date,
+            own_only=own_only and chat.kind != USER
+        )
+        return types.messages.MessagesSlice(count, messages, [], [])
+
+    def _search_common(self, request, own_only):
+        # Диапазоны id личных диалогов и групп не пересекаются: обходим чаты от новых id к старым
+        common = sorted((chat for chat in self.chats.values() if chat.kind != CHANNEL),
+                        key=lambda chat: chat.first_id, reverse=True)
+        count, messages = 0, []
+        for chat in common:
+            if request.offset_id and chat.first_id >= request.offset_id:
+                continue
+            chat_count, page = chat.search(
+                request.offset_id, request.limit - len(messages), 0,
+                request.min_date, request.max_date, own_only=own_only
+            )
+            count += chat_count
+            messages.extend(page)
+        return types.messages.MessagesSlice(count, messages[:request.limit], [], [])
+
+    def _delete_history(self, chat, own_only):
+        # Сервер удаляет историю частями и возвращает offset, пока что-то осталось
+        _, messages = chat.search(0, HISTORY_CHUNK, own_only=own_only)
+        deleted = chat.delete([message.id for message in messages])
+        _, rest = chat.search(0, 1, own_only=own_only)
+        return types.messages.AffectedHistory(pts=0, pts_count=deleted, offset=1 if rest else 0)
+
+    async def delete_messages(self, entity, message_ids, revoke=True):
+        peer = await self.get_input_entity(entity)
+        if isinstance(peer, types.InputPeerChannel):
+            await self.server.handle(CHANNEL_DELETE_MESSAGES)
+            deleted = self._chat(peer).delete(message_ids)
+        else:
+            await self.server.handle(DELETE_MESSAGES)
+            deleted = 0
+            for message_id in message_ids:
+                chat = self._chat_for_common_id(message_id)
+                if chat:
+                    deleted += chat.delete([message_id])
+        return [types.messages.AffectedMessages(pts=0, pts_count=deleted)]
+
+    async def get_messages(self, entity, ids):
+        peer = await self.get_input_entity(entity)
+        await self.server.handle(GET_MESSAGES)
+        chat = self._chat(peer)
+        return [
+            None if not chat.first_id <= message_id <= chat.last_id or chat.is_deleted(message_id)
+            else chat.message(message_id)
+            for message_id in ids
+        ]
+
+    def _dialogs(self):
+        return [
+            _Dialog(chat.title, chat.id, chat.input_peer, chat.entity, chat.date(chat.last_id), chat.last_id, chat.pinned)
+            for chat in sorted(self.chats.values(), key=lambda chat: (chat.date(chat.last_id), chat.id), reverse=True)
+        ]
+
+    async def get_dialogs(self, limit=None, offset_date=None, offset_id=0, offset_peer=None):
+        await self.server.handle(GET_DIALOGS)
+        dialogs = self._dialogs()
+        total = len(dialogs)
+        if offset_date:
+            # Как messages.getDialogs: диалоги строго после последнего полученного
+            offset = (offset_date, utils.get_peer_id(offset_peer))
+            dialogs = [dialog for dialog in dialogs if (dialog.date, dialog.id) < offset]
+        result = TotalList(dialogs[:limit] if limit else dialogs)
+        result.total = total
+        return result
+
+    async def iter_dialogs(self, ignore_pinned=False):
+        await self.server.handle(GET_DIALOGS)
+        dialogs = self._dialogs()
+        # Закрепленные диалоги идут первыми, как на настоящем сервере
+        for dialog in sorted(dialogs, key=lambda dialog: not dialog.pinned):
+            if not (ignore_pinned and dialog.pinned):
+                yield dialog
+
+    async def download_media(self, message, file=None):
+        return None
+
+
+class _Dialog:
+    """Поля telethon.tl.custom.Dialog, которые читают DialogIndex и DialogPager"""
+
+    def __init__(self, title, chat_id, input_entity, entity, date, top_message_id, pinned=False):
+        self.title = title
+        self.id = chat_id
+        self.input_entity = input_entity
+        self.entity = entity
+        self.date = date
+        self.message = types.Message(id=top_message_id, peer_id=utils.get_peer(input_entity), date=date, message='')
+        self.pinned = pinned
+        self.unread_count = 0
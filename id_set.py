@@ -0,0 +1,34 @@
+"""Компактное хранение найденных сообщений: только id"""
+from array import array
+
+
+class MessageIdSet:
+    """Список id сообщений на основе array('i') (4 байта на сообщение).
+
+    Вместо целых объектов Message хранятся только id. Пачки для удаления
+    отдаются списками по size штук: в памяти одновременно живут только
+    они, а не весь набор в виде списка. archived - сообщения уже записаны
+    в архив при сборе, и перед удалением их не нужно загружать заново.
+    """
+
+    def __init__(self):
+        self.ids = array('i')
+        self.archived = False
+
+    def add(self, message):
+        self.ids.append(message.id)
+
+    def add_page(self, page):
+        for message in page:
+            self.add(message)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def batches(self, size):
+        """Пачки id по size штук (списки, которые принимает запрос удаления)"""
+        for start in range(0, len(self.ids), size):
+            yield self.ids[start:start + size].tolist()
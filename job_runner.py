@@ -0,0 +1,516 @@
+"""Запуск очистки без меню: задание из аргументов командной строки или файла JSON/YAML
+
+Пример задания (job.json):
+
+    {
+        "chats": {"types": ["group", "channel"], "name": "^Рабочий"},
+        "scope": {"since": "2024-01-01", "until": "2024-06-30"},
+        "filters": {"media": "photo"},
+        "concurrency": 4,
+        "rate_limits": {"DeleteMessages": 2.0},
+        "archive_dir": "archive"
+    }
+
+Запуск: python job_runner.py --job job.json (параметры командной строки
+переопределяют значения из файла). С "auto_expire" (или --auto-expire)
+вместо разовой очистки запускается автоудаление по таймеру - до Ctrl+C или
+SIGTERM; значение true берет сроки из AUTO_EXPIRE в config.py, а словарь
+{тип или id чата: секунды} задает их прямо в задании. Вход в аккаунт должен быть выполнен
+заранее в интерактивном режиме с KEEP_SESSION = True; пароль сессии
+берется из SESSION_PASSWORD или переменной TG_CLEANER_PASSWORD.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import re
+import signal
+import sys
+import time
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from message_scanner import MessageSelection, MEDIA_FILTERS
+from dialog_index import USER, BOT, GROUP, CHANNEL
+import events
+
+# Коды завершения
+EXIT_OK = 0
+EXIT_PARTIAL = 1        # часть чатов не удалось очистить
+EXIT_BAD_JOB = 2        # ошибка в задании или аргументах
+EXIT_NOT_AUTHORIZED = 3  # нет сохраненной сессии или не подходит пароль
+EXIT_ERROR = 4          # задание прервано ошибкой
+EXIT_INTERRUPTED = 130  # прервано пользователем (Ctrl+C)
+
+CHAT_TYPES = (USER, BOT, GROUP, CHANNEL)
+
+logger = logging.getLogger('job_runner')
+
+
+class JobSpecError(ValueError):
+    """Ошибка в описании задания"""
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на событие: время, уровень, событие и его поля.
+
+    У событий модулей очистки (events.report) есть имя события, а их текст
+    для человека попадает в поле message. Записи Telethon идут с его
+    текстом в качестве события.
+    """
+
+    def format(self, record):
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname.lower(),
+            'event': getattr(record, 'event', None) or record.getMessage()
+        }
+        if getattr(record, 'event', None):
+            data['message'] = record.getMessage()
+        data.update(getattr(record, 'fields', {}))
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _with_fields(record):
+    # У записей Telethon нет полей события, а текстовый формат их ожидает
+    if not hasattr(record, 'fields'):
+        record.fields = {}
+    return True
+
+
+def log_event(event, level=logging.INFO, **fields):
+    logger.log(level, event, extra={'fields': fields})
+
+
+def setup_logging(log_format):
+    """Все события в stderr: события задания, события модулей очистки
+    (FloodWait, ошибки пачек, takeout) и предупреждения Telethon.
+
+    stdout остается для подсказок человеку, а корневой журнал не
+    настраивается, поэтому в stderr не попадают посторонние строки.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(_with_fields)
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s %(fields)s'))
+    for target, level in ((logger, logging.INFO), (events.logger, logging.INFO),
+                          (logging.getLogger('telethon'), logging.WARNING)):
+        target.handlers = [handler]
+        target.setLevel(level)
+        target.propagate = False
+
+
+def load_job_file(path):
+    """Задание из файла .json, .yaml или .yml"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise JobSpecError("Для заданий в формате YAML установите PyYAML")
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+    except OSError as e:
+        raise JobSpecError(f"Не удалось прочитать задание: {e}")
+    except ValueError as e:
+        raise JobSpecError(f"Неверный формат задания: {e}")
+
+    if not isinstance(data, dict):
+        raise JobSpecError("Задание должно быть объектом")
+    return data
+
+
+def _parse_rate(text):
+    method, _, rate = text.partition('=')
+    try:
+        return method, float(rate)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается МЕТОД=СКОРОСТЬ, получено {text!r}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Удаление ваших сообщений в Telegram по заданию, без интерактивного меню"
+    )
+    parser.add_argument('--job', help="файл задания (JSON или YAML)")
+    parser.add_argument('--chat-id', type=int, action='append', dest='ids', help="id чата (можно несколько раз)")
+    parser.add_argument('--type', choices=CHAT_TYPES, action='append', dest='types', help="тип чатов (можно несколько раз)")
+    parser.add_argument('--name', help="регулярное выражение для названия чата")
+    parser.add_argument('--all-chats', action='store_true', default=None, help="все чаты аккаунта")
+    parser.add_argument('--since', help="начало периода (ГГГГ-ММ-ДД или ГГГГ-ММ-ДДTЧЧ:ММ)")
+    parser.add_argument('--until', help="конец периода, не включая")
+    parser.add_argument('--last-hours', type=float, help="только последние N часов")
+    parser.add_argument('--media', choices=sorted(MEDIA_FILTERS), help="только сообщения с этим типом медиа")
+    parser.add_argument('--query', help="только сообщения со словом или фразой")
+    parser.add_argument('--pattern', help="только сообщения, текст которых подходит под выражение")
+    parser.add_argument('--revoke-history', action='store_true', default=None,
+                        help="очищать личные диалоги целиком у обоих собеседников")
+    parser.add_argument('--concurrency', type=int, help="сколько чатов обрабатывать одновременно")
+    parser.add_argument('--rate', type=_parse_rate, action='append', dest='rates',
+                        help="начальная скорость метода, например DeleteMessages=2")
+    parser.add_argument('--dry-run', action='store_true', default=None, help="только оценить объем, ничего не удалять")
+    parser.add_argument('--archive', dest='archive_dir', help="папка архива: сохранять сообщения перед удалением")
+    parser.add_argument('--archive-media', action='store_true', default=None, help="скачивать в архив и вложения")
+    parser.add_argument('--metrics-textfile', help="файл метрик Prometheus (для textfile collector)")
+    parser.add_argument('--metrics-port', type=int, help="порт HTTP для метрик Prometheus (/metrics)")
+    parser.add_argument('--trace', dest='trace_file', help="файл трассировки по чатам и пачкам (JSONL)")
+    parser.add_argument('--auto-expire', action='store_true', default=None,
+                        help="автоудаление по таймеру из AUTO_EXPIRE (работает до остановки)")
+    parser.add_argument('--account', help="имя аккаунта из списка аккаунтов (см. multi_account.py)")
+    parser.add_argument('--accounts', help="файл списка аккаунтов (JSON); по умолчанию ACCOUNTS из config.py")
+    parser.add_argument('--log-format', choices=('json', 'text'), default='json', help="формат логов (stderr)")
+    return parser
+
+
+def build_job(args):
+    """Итоговое задание: файл из --job, поверх него параметры командной строки"""
+    job = load_job_file(args.job) if args.job else {}
+    chats, scope, filters = (_section(job, name) for name in ('chats', 'scope', 'filters'))
+
+    for key, value in (('ids', args.ids), ('types', args.types), ('name', args.name), ('all', args.all_chats)):
+        if value is not None:
+            chats[key] = value
+    for key, value in (('since', args.since), ('until', args.until), ('last_hours', args.last_hours)):
+        if value is not None:
+            scope[key] = value
+    for key, value in (('media', args.media), ('query', args.query), ('pattern', args.pattern)):
+        if value is not None:
+            filters[key] = value
+
+    job['chats'], job['scope'], job['filters'] = chats, scope, filters
+    if args.revoke_history is not None:
+        job['revoke_history'] = args.revoke_history
+    if args.concurrency is not None:
+        job['concurrency'] = args.concurrency
+    if args.rates:
+        job['rate_limits'] = dict(job.get('rate_limits') or {}, **dict(args.rates))
+    if args.dry_run is not None:
+        job['dry_run'] = args.dry_run
+    if args.archive_dir is not None:
+        job['archive_dir'] = args.archive_dir
+    if args.archive_media is not None:
+        job['archive_media'] = args.archive_media
+    for key in ('metrics_textfile', 'metrics_port', 'trace_file', 'account', 'accounts'):
+        if getattr(args, key) is not None:
+            job[key] = getattr(args, key)
+    if args.auto_expire is not None:
+        job['auto_expire'] = args.auto_expire
+
+    validate_job(job)
+    return job
+
+
+def _section(job, name):
+    """Копия раздела задания; JobSpecError, если это не объект"""
+    section = job.get(name) or {}
+    if not isinstance(section, dict):
+        raise JobSpecError(f"{name} должно быть объектом, получено {section!r}")
+    return dict(section)
+
+
+def _check_strings(section, prefix, *keys, allowed=(str,)):
+    for key in keys:
+        if section.get(key) is not None and not isinstance(section[key], allowed):
+            raise JobSpecError(f"{prefix}.{key} должно быть строкой, получено {section[key]!r}")
+
+
+def validate_job(job):
+    chats = job['chats']
+    # Типы проверяются до того, как значения пойдут в set() и re.compile()
+    if chats.get('types') is not None and (
+            not isinstance(chats['types'], list) or not all(isinstance(t, str) for t in chats['types'])):
+        raise JobSpecError("chats.types должно быть списком типов чатов")
+    _check_strings(chats, 'chats', 'name')
+    # YAML сам превращает 2024-01-01 в дату
+    _check_strings(job['scope'], 'scope', 'since', 'until', allowed=(str, datetime.date))
+    _check_strings(job['filters'], 'filters', 'media', 'query', 'pattern')
+    if job.get('auto_expire') is not None and not isinstance(job['auto_expire'], (bool, dict)):
+        raise JobSpecError("auto_expire должно быть true/false или объектом {тип или id чата: секунды}")
+    if isinstance(job.get('auto_expire'), dict):
+        job['auto_expire'] = parse_ttls(job['auto_expire'])
+    if not (job.get('auto_expire') or chats.get('all') or chats.get('ids') or chats.get('types') or chats.get('name')):
+        raise JobSpecError("Не указаны чаты: задайте ids, types, name или all")
+    unknown = set(chats.get('types') or ()) - set(CHAT_TYPES)
+    if unknown:
+        raise JobSpecError(f"Неизвестные типы чатов: {', '.join(sorted(unknown))}")
+    if chats.get('name'):
+        try:
+            re.compile(chats['name'])
+        except re.error as e:
+            raise JobSpecError(f"Неверное выражение для названия чата: {e}")
+    # Числа из файла задания могут прийти строками: приводим их здесь, чтобы ошибка была ошибкой задания
+    if chats.get('ids'):
+        if not isinstance(chats['ids'], list):
+            raise JobSpecError("chats.ids должно быть списком id чатов")
+        chats['ids'] = [_parse_number(chat_id, 'chats.ids', int) for chat_id in chats['ids']]
+    if job.get('concurrency') is not None:
+        job['concurrency'] = _parse_number(job['concurrency'], 'concurrency', int, minimum=1)
+    if job['scope'].get('last_hours') is not None:
+        job['scope']['last_hours'] = _parse_number(job['scope']['last_hours'], 'last_hours', float, minimum=0)
+    if job.get('rate_limits') is not None:
+        if not isinstance(job['rate_limits'], dict):
+            raise JobSpecError("rate_limits должно быть словарем {метод: запросов в секунду}")
+        job['rate_limits'] = {
+            method: _parse_number(rate, f"rate_limits.{method}", float, minimum=0, inclusive=False)
+            for method, rate in job['rate_limits'].items()
+        }
+    if job.get('metrics_port') is not None:
+        job['metrics_port'] = _parse_number(job['metrics_port'], 'metrics_port', int, minimum=1)
+    # Проверяет, что аккаунт есть в списке
+    job_account(job)
+    # Проверяет даты и фильтры
+    build_selection(job)
+
+
+def _parse_number(value, name, kind, minimum=None, inclusive=True):
+    """Число из задания; JobSpecError, если это не число или оно меньше minimum"""
+    try:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        number = kind(value)
+        if kind is int and number != float(value):
+            raise ValueError(value)
+    except (TypeError, ValueError):
+        raise JobSpecError(f"Неверное значение {name}: {value!r}")
+    if minimum is not None and (number < minimum or (not inclusive and number == minimum)):
+        limit = f"не меньше {minimum}" if inclusive else f"больше {minimum}"
+        raise JobSpecError(f"{name} должно быть {limit}")
+    return number
+
+
+def job_account(job):
+    """Запись аккаунта из списка аккаунтов или None, если задание для основного аккаунта"""
+    if not job.get('account'):
+        return None
+    from multi_account import load_accounts, find_account, AccountError
+    try:
+        return find_account(load_accounts(job.get('accounts')), job['account'])
+    except AccountError as e:
+        raise JobSpecError(str(e))
+
+
+def parse_ttls(ttls):
+    """Сроки автоудаления из задания: ключи JSON - строки, id чатов переводятся в числа"""
+    parsed = {}
+    for key, seconds in ttls.items():
+        key = str(key)
+        if key.lstrip('-').isdigit():
+            key = int(key)
+        elif key not in CHAT_TYPES:
+            raise JobSpecError(f"Неизвестный тип чата в auto_expire: {key}")
+        try:
+            parsed[key] = float(seconds)
+        except (TypeError, ValueError):
+            raise JobSpecError(f"Неверный срок в auto_expire для {key}: {seconds}")
+    return parsed
+
+
+def _parse_datetime(value, name):
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value))
+    except ValueError:
+        raise JobSpecError(f"Неверная дата в {name}: {value}")
+
+
+def build_selection(job):
+    """MessageSelection по разделам scope и filters задания"""
+    scope, filters = job['scope'], job['filters']
+    min_date = _parse_datetime(scope.get('since'), 'since')
+    max_date = _parse_datetime(scope.get('until'), 'until')
+    if scope.get('last_hours') is not None:
+        min_date = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=float(scope['last_hours']))
+
+    try:
+        selection = MessageSelection(
+            min_date, max_date, media=filters.get('media'),
+            query=filters.get('query'), pattern=filters.get('pattern')
+        )
+    except (ValueError, re.error) as e:
+        raise JobSpecError(str(e))
+
+    # Обе границы уже приведены к UTC
+    if selection.min_date and selection.max_date and selection.min_date >= selection.max_date:
+        raise JobSpecError("Начало периода должно быть раньше конца")
+    return selection
+
+
+def select_chats(all_chats, chats_spec):
+    """Чаты из индекса, подходящие под раздел chats задания"""
+    ids = set(chats_spec.get('ids') or ())
+    types = set(chats_spec.get('types') or ())
+    name = re.compile(chats_spec['name'], re.IGNORECASE) if chats_spec.get('name') else None
+
+    selected = []
+    for chat in all_chats:
+        if ids and chat['id'] not in ids:
+            continue
+        if types and chat['type'] not in types:
+            continue
+        if name and not name.search(chat['name'] or ''):
+            continue
+        selected.append(chat)
+    return selected
+
+
+async def run_job(job):
+    """Выполняет задание и возвращает код завершения"""
+    # Импорт здесь: user_deleter при импорте читает config.py
+    from user_deleter import (
+        UserMessageDeleter, BULK_CONCURRENCY, AUTO_EXPIRE, ARCHIVE_DIR, ARCHIVE_MEDIA,
+        METRICS_TEXTFILE, METRICS_PORT, TRACE_FILE
+    )
+
+    started = time.monotonic()
+    selection = build_selection(job)
+
+    account = job_account(job)
+    if account:
+        # Порт и файлы метрик из config.py общие, а процессов аккаунтов несколько
+        METRICS_TEXTFILE = METRICS_PORT = TRACE_FILE = None
+
+    try:
+        deleter = UserMessageDeleter(
+            interactive=False,
+            concurrency=int(job.get('concurrency') or BULK_CONCURRENCY),
+            rate_limits=job.get('rate_limits'),
+            archive_dir=job.get('archive_dir', ARCHIVE_DIR),
+            archive_media=bool(job.get('archive_media', ARCHIVE_MEDIA)),
+            metrics_textfile=job.get('metrics_textfile', METRICS_TEXTFILE),
+            metrics_port=job.get('metrics_port', METRICS_PORT),
+            trace_file=job.get('trace_file', TRACE_FILE),
+            account=account
+        )
+    except ValueError as e:
+        log_event('session_error', logging.ERROR, error=str(e))
+        return EXIT_NOT_AUTHORIZED
+
+    try:
+        await deleter.client.connect()
+        if not await deleter.client.is_user_authorized():
+            login = (f"python multi_account.py --login {job['account']}" if job.get('account')
+                     else "python user_deleter.py с KEEP_SESSION = True")
+            log_event('not_authorized', logging.ERROR, error=f"Нет сохраненной сессии: войдите через {login}")
+            return EXIT_NOT_AUTHORIZED
+        await deleter.start()
+
+        if job.get('auto_expire'):
+            return await run_auto_expire(deleter, job['auto_expire'] if isinstance(job['auto_expire'], dict) else AUTO_EXPIRE)
+
+        all_chats = await deleter.dialogs.select()
+        chats = select_chats(all_chats, job['chats'])
+        log_event('chats_selected', chats=len(chats), total=len(all_chats))
+        if not chats:
+            log_event('job_finished', deleted=0, chats=0, failed=0, seconds=round(time.monotonic() - started, 1))
+            return EXIT_OK
+
+        revoke_history = bool(job.get('revoke_history'))
+
+        if job.get('dry_run'):
+            rows = await deleter.planner.plan(chats, selection, allow_revoke_history=revoke_history)
+            for row in rows:
+                fields = {'chat_id': row['chat']['id'], 'chat': row['chat']['name']}
+                if 'error' in row:
+                    log_event('chat_plan', logging.WARNING, error=row['error'], **fields)
+                else:
+                    log_event('chat_plan', count=row['count'], upper_bound=row['upper_bound'],
+                              strategy=row['strategy'], requests=row['requests'],
+                              seconds=round(row['seconds'], 1), **fields)
+            log_event('plan_finished', chats=len(rows),
+                      count=sum(row.get('count', 0) for row in rows),
+                      seconds=round(sum(row.get('seconds', 0) for row in rows), 1))
+            return EXIT_OK
+
+        found = await deleter.discovery.discover(chats, selection)
+        chats = [chat for chat in chats if chat['id'] in found]
+        log_event('discovery_finished', chats=len(chats), messages=sum(info['count'] for info in found.values()))
+
+        results = await deleter.bulk.run(chats, selection, revoke_history, found, show_progress=False)
+
+        failed = 0
+        for chat_id, result in results.items():
+            counts = {'deleted': result['deleted'], 'skipped': result['skipped'], 'failed': result['failed']}
+            if result['error'] or result['failed']:
+                failed += 1
+                log_event('chat_failed', logging.ERROR, chat_id=chat_id, chat=result['name'],
+                          error=result['error'], **counts)
+            else:
+                log_event('chat_done', chat_id=chat_id, chat=result['name'],
+                          strategy=result['strategy'], **counts)
+
+        log_event('job_finished', deleted=sum(result['deleted'] for result in results.values()),
+                  skipped=sum(result['skipped'] for result in results.values()),
+                  archived=deleter.archive.archived if deleter.archive else None,
+                  chats=len(results), failed=failed, seconds=round(time.monotonic() - started, 1),
+                  rates=deleter.limiter.state())
+        return EXIT_PARTIAL if failed else EXIT_OK
+    finally:
+        # Сессия сохраняется (в режиме KEEP_SESSION), файлы сессии не удаляются
+        await deleter.stop_metrics()
+        await deleter.takeout.stop()
+        deleter.save_session()
+        await deleter.client.disconnect()
+        deleter.checkpoints.close()
+
+
+async def run_auto_expire(deleter, ttls):
+    """Автоудаление до остановки процесса"""
+    if not ttls:
+        log_event('bad_job', logging.ERROR, error="Не заданы сроки автоудаления (AUTO_EXPIRE)")
+        return EXIT_BAD_JOB
+
+    daemon = deleter.auto_expire_daemon()
+    daemon.ttls = ttls
+    log_event('auto_expire_started', ttls=ttls)
+    try:
+        await daemon.run()
+    finally:
+        log_event('auto_expire_stopped', deleted=daemon.deleted, pending=len(daemon.queue))
+        daemon.queue.close()
+
+
+async def _run_until_signal(job):
+    # SIGTERM (например, от systemd) завершает задание так же аккуратно, как Ctrl+C
+    task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    return await run_job(job)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging(args.log_format)
+
+    try:
+        job = build_job(args)
+    except JobSpecError as e:
+        log_event('bad_job', logging.ERROR, error=str(e))
+        return EXIT_BAD_JOB
+    except (TypeError, ValueError, AttributeError) as e:
+        # Задание необычной формы, которую проверки выше не предусмотрели
+        log_event('bad_job', logging.ERROR, error=f"Неверное задание: {type(e).__name__}: {e}")
+        return EXIT_BAD_JOB
+
+    log_event('job_started', account=job.get('account'), chats=job['chats'], scope=job['scope'], filters=job['filters'],
+              dry_run=bool(job.get('dry_run')))
+    try:
+        return asyncio.run(_run_until_signal(job))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        log_event('job_interrupted', logging.WARNING)
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        log_event('job_failed', logging.ERROR, error=f"{type(e).__name__}: {e}")
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
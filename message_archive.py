@@ -0,0 +1,141 @@
+"""Архив сообщений перед удалением: сжатый JSONL на каждый чат"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+from telethon.tl import types
+from rate_limiter import AdaptiveRateLimiter, GET_FILE
+from events import report
+
+# Папка архива по умолчанию
+ARCHIVE_DIR = 'archive'
+# Сколько файлов медиа скачивается одновременно
+MEDIA_WORKERS = 3
+
+
+def _fsync_dir(path):
+    # Без этого новый файл может пропасть после сбоя питания, даже если его данные записаны
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append_member(path, data):
+    """Дописывает данные отдельным gzip-блоком и дожидается записи на диск.
+
+    Файл из нескольких gzip-блоков читается gzip.open() как один поток, а
+    оборванный последний блок теряет только ту пачку, которая еще не удалялась.
+    """
+    created = not os.path.exists(path)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab', mtime=0) as archive:
+            archive.write(data)
+        raw.flush()
+        os.fsync(raw.fileno())
+    if created:
+        _fsync_dir(os.path.dirname(path) or '.')
+
+
+def _media_info(media):
+    """Описание вложения без самого файла"""
+    if media is None:
+        return None
+
+    info = {'type': type(media).__name__}
+    if isinstance(media, types.MessageMediaPhoto) and isinstance(media.photo, types.Photo):
+        info['photo_id'] = media.photo.id
+    elif isinstance(media, types.MessageMediaDocument) and isinstance(media.document, types.Document):
+        document = media.document
+        info.update(document_id=document.id, mime_type=document.mime_type, size=document.size)
+        for attribute in document.attributes:
+            if isinstance(attribute, types.DocumentAttributeFilename):
+                info['file_name'] = attribute.file_name
+    elif isinstance(media, types.MessageMediaWebPage) and isinstance(media.webpage, types.WebPage):
+        info['url'] = media.webpage.url
+    return info
+
+
+def message_record(chat_id, message):
+    """Запись архива для одного сообщения"""
+    reply_to = getattr(message, 'reply_to', None)
+    return {
+        'id': message.id,
+        'chat_id': chat_id,
+        'date': message.date.isoformat() if message.date else None,
+        'edit_date': message.edit_date.isoformat() if getattr(message, 'edit_date', None) else None,
+        'text': getattr(message, 'message', None) or '',
+        'reply_to': getattr(reply_to, 'reply_to_msg_id', None),
+        'grouped_id': getattr(message, 'grouped_id', None),
+        'media': _media_info(getattr(message, 'media', None))
+    }
+
+
+class MessageArchive:
+    """Копия каждого сообщения перед удалением в {directory}/{id чата}.jsonl.gz.
+
+    Архив пишется пачками: каждая пачка дописывается отдельным gzip-блоком
+    и сбрасывается на диск (fsync), и только после этого ее можно удалять.
+    В памяти держится одна пачка, сжатие и запись идут в отдельном потоке.
+    При download_media вложения скачиваются в {directory}/{id чата}/ не
+    больше чем media_workers файлов одновременно (на все чаты сразу), а в
+    записи сообщения сохраняется путь к файлу. Скачивание идет через
+    ограничитель и после FloodWait повторяется. Если файл скачать так и не
+    удалось, id сообщения попадает в download_failed[id чата], и конвейер
+    удаления это сообщение не удаляет.
+    """
+
+    def __init__(self, client, directory=ARCHIVE_DIR, download_media=False, media_workers=MEDIA_WORKERS,
+                 limiter=None):
+        self.client = client
+        self.directory = directory
+        self.download_media = download_media
+        self.media_slots = asyncio.Semaphore(max(1, media_workers))
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.archived = 0
+        self.download_failed = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, chat_id):
+        return os.path.join(self.directory, f"{chat_id}.jsonl.gz")
+
+    async def _download(self, chat_id, message, record):
+        media_dir = os.path.join(self.directory, str(chat_id))
+        async with self.media_slots:
+            try:
+                os.makedirs(media_dir, exist_ok=True)
+                path = await self.limiter.call(
+                    GET_FILE, self.client.download_media, message, file=os.path.join(media_dir, str(message.id))
+                )
+                record['file'] = os.path.relpath(path, self.directory) if path else None
+                self.download_failed.get(chat_id, set()).discard(message.id)
+            except Exception as e:
+                # Запись сообщения сохраняется без файла, а само сообщение не удаляется
+                record['file'] = None
+                record['download_error'] = str(e)
+                self.download_failed.setdefault(chat_id, set()).add(message.id)
+                report('media_download_failed',
+                       f"⚠️ Не удалось скачать вложение сообщения #{message.id} ({e}), оно не будет удалено",
+                       logging.WARNING, chat_id=chat_id, message_id=message.id, error=str(e))
+
+    async def write(self, chat_id, messages):
+        """Архивирует пачку сообщений одного чата; возвращается, когда записи на диске"""
+        if not messages:
+            return
+
+        records = [message_record(chat_id, message) for message in messages]
+        if self.download_media:
+            await asyncio.gather(*(
+                self._download(chat_id, message, record)
+                for message, record in zip(messages, records)
+                if record['media'] and record['media']['type'] != 'MessageMediaWebPage'
+            ))
+
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _append_member, self.path(chat_id), data)
+        self.archived += len(records)
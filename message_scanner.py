@@ -0,0 +1,290 @@
+"""Поиск ваших сообщений на стороне сервера (messages.search с фильтром по отправителю)"""
+import datetime
+import logging
+import re
+from telethon import errors, utils
+from telethon.tl import types
+from telethon.tl.functions.messages import SearchRequest
+from rate_limiter import AdaptiveRateLimiter, SEARCH
+from id_set import MessageIdSet
+from events import report
+
+# Максимальный размер страницы, который отдает messages.search
+PAGE_SIZE = 100
+
+# Серверные фильтры по типу содержимого
+MEDIA_FILTERS = {
+    'photo': types.InputMessagesFilterPhotos,
+    'video': types.InputMessagesFilterVideo,
+    'gif': types.InputMessagesFilterGif,
+    'voice': types.InputMessagesFilterVoice,
+    'round': types.InputMessagesFilterRoundVideo,
+    'music': types.InputMessagesFilterMusic,
+    'document': types.InputMessagesFilterDocument,
+    'url': types.InputMessagesFilterUrl
+}
+
+# Названия типов медиа для меню
+MEDIA_FILTER_NAMES = {
+    'photo': "Фото",
+    'video': "Видео",
+    'gif': "GIF",
+    'voice': "Голосовые",
+    'round': "Видеосообщения (кружки)",
+    'music': "Музыка",
+    'document': "Файлы",
+    'url': "Со ссылками"
+}
+
+
+def _as_utc(date):
+    """Приводит дату к UTC; дата без часового пояса считается локальной"""
+    if date is None:
+        return None
+    return date.astimezone(datetime.timezone.utc)
+
+
+class MessageSelection:
+    """Какие из ваших сообщений удалять: все или только часть.
+
+    min_date/max_date задают окно [min_date, max_date); любую из границ
+    можно не указывать. media - тип содержимого (ключ MEDIA_FILTERS),
+    query - слово или ссылка для поиска; оба фильтра выполняет сервер.
+    pattern - регулярное выражение, которое проверяется уже на клиенте и
+    только для сообщений, которые вернул сервер. text - описание выборки
+    для вывода пользователю.
+    """
+
+    def __init__(self, min_date=None, max_date=None, text=None, media=None, query=None, pattern=None):
+        if media is not None and media not in MEDIA_FILTERS:
+            raise ValueError(f"Неизвестный тип медиа: {media}")
+        self.min_date = _as_utc(min_date)
+        self.max_date = _as_utc(max_date)
+        self.text = text
+        self.media = media
+        self.query = query or None
+        self.pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+
+    @property
+    def is_all(self):
+        return (self.min_date is None and self.max_date is None
+                and not self.is_filtered)
+
+    @property
+    def is_filtered(self):
+        """Есть ли фильтр по содержимому (а не только по дате)"""
+        return bool(self.media or self.query or self.pattern)
+
+    def server_filter(self):
+        """InputMessagesFilter* для запроса messages.search"""
+        if self.media:
+            return MEDIA_FILTERS[self.media]()
+        return types.InputMessagesFilterEmpty()
+
+    def contains(self, message):
+        if self.min_date and message.date < self.min_date:
+            return False
+        if self.max_date and message.date >= self.max_date:
+            return False
+        if self.pattern and not self.pattern.search(message.message or ''):
+            return False
+        return True
+
+
+class OwnMessageScanner:
+    """Постраничный обход только ваших сообщений в чате.
+
+    Сервер сам отбирает сообщения по отправителю (from_id = вы), поэтому
+    количество запросов и трафик зависят от числа ваших сообщений, а не от
+    размера чата. Ограничения по количеству нет: обходится вся история.
+    Если задан metrics (Metrics), по каждому чату считаются просмотренные
+    и отобранные сообщения.
+    """
+
+    def __init__(self, client, limiter=None, page_size=PAGE_SIZE, metrics=None):
+        self.client = client
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.metrics = metrics
+        self.page_size = min(page_size, PAGE_SIZE)
+        # Через кого идут запросы поиска (обычный клиент или takeout-сессия)
+        self.reader = client
+        self.search_method = SEARCH
+
+    def use_reader(self, reader=None, method=SEARCH):
+        """Направляет поиск через другой клиент (None - обратно через обычный)"""
+        self.reader = reader or self.client
+        self.search_method = method if reader else SEARCH
+
+    async def _search(self, request):
+        if self.reader is self.client:
+            return await self.limiter.call(SEARCH, self.client, request)
+        try:
+            return await self.limiter.call(self.search_method, self.reader, request)
+        except (errors.TakeoutInvalidError, ValueError):
+            # Takeout-сессию завершили или отозвали: дальше ищем обычным клиентом
+            report('takeout_lost', "⚠️ Takeout-сессия больше недействительна, поиск продолжается через обычный клиент",
+                   logging.WARNING)
+            self.client.session.takeout_id = None
+            self.use_reader(None)
+            return await self.limiter.call(SEARCH, self.client, request)
+
+    def _record(self, chat_id, received, page):
+        if self.metrics:
+            self.metrics.inc('tg_cleaner_messages_scanned_total', len(received), chat=chat_id)
+            self.metrics.inc('tg_cleaner_messages_selected_total', len(page), chat=chat_id)
+            self.metrics.progress()
+
+    def _build_request(self, peer, offset_id, limit, selection=None, message_filter=None, add_offset=0):
+        selection = selection or MessageSelection()
+        return SearchRequest(
+            peer=peer,
+            q=selection.query or '',
+            filter=message_filter or selection.server_filter(),
+            min_date=selection.min_date,
+            max_date=selection.max_date,
+            offset_id=offset_id,
+            add_offset=add_offset,
+            limit=limit,
+            max_id=0,
+            min_id=0,
+            hash=0,
+            from_id=types.InputPeerSelf()
+        )
+
+    async def iter_pages(self, entity, min_id=0, max_id=0, selection=None):
+        """Страницы ваших сообщений от новых к старым.
+
+        min_id/max_id ограничивают диапазон id (не включая границы),
+        selection - период. Границы периода передаются серверу, поэтому
+        поиск сразу начинается с нужной даты и заканчивается на нижней
+        границе, не просматривая более старые сообщения.
+        """
+        selection = selection or MessageSelection()
+        peer = await self.client.get_input_entity(entity)
+        offset_id = max_id
+
+        while True:
+            request = self._build_request(peer, offset_id, self.page_size, selection)
+            result = await self._search(request)
+            received = [m for m in result.messages if not isinstance(m, types.MessageEmpty)]
+            if not received:
+                return
+
+            # В личных диалогах Telegram игнорирует from_id, поэтому
+            # дополнительно проверяем флаг исходящего сообщения
+            page = [m for m in received if m.out and m.id > min_id and selection.contains(m)]
+            self._record(utils.get_peer_id(peer), received, page)
+            if page:
+                yield page
+
+            # Короткая страница не значит, что история кончилась: некоторые чаты отдают
+            # неполные страницы, хотя старше есть еще сообщения. Конец - только пустая страница
+            oldest = received[-1]
+            if offset_id and oldest.id >= offset_id:
+                return
+            offset_id = oldest.id
+            if offset_id <= min_id:
+                return
+            if selection.min_date and oldest.date < selection.min_date:
+                return
+
+    def counts_on_server(self, peer, min_id=0, max_id=0, selection=None):
+        """Может ли сервер сам посчитать ваши сообщения в этом чате"""
+        private = isinstance(peer, (types.InputPeerUser, types.InputPeerSelf))
+        client_side = selection is not None and selection.pattern is not None
+        return not private and not client_side and not min_id and not max_id
+
+    async def server_count(self, entity, selection=None, message_filter=None):
+        """Счетчик сервера одним запросом с limit=0, без загрузки сообщений.
+
+        В личных диалогах from_id игнорируется, поэтому там это число всех
+        сообщений диалога (ваших и собеседника), то есть оценка сверху.
+        """
+        peer = await self.client.get_input_entity(entity)
+        request = self._build_request(peer, 0, 0, selection, message_filter)
+        result = await self._search(request)
+        return getattr(result, 'count', len(result.messages))
+
+    async def count(self, entity, min_id=0, max_id=0, selection=None):
+        """Количество ваших сообщений в чате (с учетом периода).
+
+        В группах и каналах это один запрос с limit=0 (сервер возвращает только
+        счетчик). В личных диалогах from_id не работает, поэтому там страницы
+        просто пересчитываются без сохранения сообщений.
+        """
+        peer = await self.client.get_input_entity(entity)
+
+        if self.counts_on_server(peer, min_id, max_id, selection):
+            return await self.server_count(peer, selection)
+
+        count = 0
+        async for page in self.iter_pages(peer, min_id, max_id, selection):
+            count += len(page)
+        return count
+
+    async def collect(self, entity, min_id=0, max_id=0, selection=None, archive=None):
+        """Все найденные сообщения в компактном виде (MessageIdSet).
+
+        Если передан archive (MessageArchive), каждая страница записывается
+        в него сразу, пока объекты Message еще есть, и перед удалением их не
+        придется загружать заново.
+        """
+        peer = await self.client.get_input_entity(entity)
+        selected = MessageIdSet()
+        async for page in self.iter_pages(peer, min_id, max_id, selection):
+            if archive:
+                await archive.write(utils.get_peer_id(peer), page)
+            selected.add_page(page)
+        selected.archived = archive is not None
+        return selected
+
+    async def probe(self, entity, selection=None):
+        """Количество ваших сообщений и id самого нового и самого старого из них.
+
+        Не больше двух запросов по одному сообщению. Возвращает
+        (count, newest_id, oldest_id); для пустого чата id равны 0.
+        """
+        peer = await self.client.get_input_entity(entity)
+        result = await self._search(self._build_request(peer, 0, 1, selection))
+        count = getattr(result, 'count', len(result.messages))
+        if not result.messages:
+            return 0, 0, 0
+
+        newest_id = oldest_id = result.messages[0].id
+        if count > 1:
+            request = self._build_request(peer, 0, 1, selection, add_offset=count - 1)
+            result = await self._search(request)
+            if result.messages:
+                oldest_id = result.messages[-1].id
+        return count, newest_id, oldest_id
+
+    async def iter_common_pages(self, selection=None):
+        """Страницы ваших сообщений сразу во всех личных диалогах и обычных группах.
+
+        Это поиск с пустым peer: сервер ищет по общему ящику сообщений
+        аккаунта, где у личных диалогов и обычных групп единая нумерация id.
+        Супергруппы и каналы в этот поиск не попадают.
+        """
+        selection = selection or MessageSelection()
+        peer = types.InputPeerEmpty()
+        offset_id = 0
+
+        while True:
+            request = self._build_request(peer, offset_id, self.page_size, selection)
+            result = await self._search(request)
+            received = [m for m in result.messages if not isinstance(m, types.MessageEmpty)]
+            if not received:
+                return
+
+            page = [m for m in received if m.out and selection.contains(m)]
+            self._record('common', received, page)
+            if page:
+                yield page
+
+            # Как и в iter_pages, конец - только пустая страница
+            oldest = received[-1]
+            if offset_id and oldest.id >= offset_id:
+                return
+            offset_id = oldest.id
+            if selection.min_date and oldest.date < selection.min_date:
+                return
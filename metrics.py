@@ -0,0 +1,195 @@
+"""Метрики в формате Prometheus и трассировка в JSONL"""
+import asyncio
+import contextlib
+import json
+import os
+import time
+from events import report
+
+# Границы корзин гистограммы длительности запросов, в секундах
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Как часто обновляется textfile, в секундах
+TEXTFILE_INTERVAL = 15.0
+
+# Описание и тип каждой метрики
+METRICS = {
+    'tg_cleaner_requests_total': ('counter', "Запросы к API по методам и результату (ok, flood, error)"),
+    'tg_cleaner_request_duration_seconds': ('histogram', "Длительность запросов к API без ожидания ограничителя"),
+    'tg_cleaner_flood_waits_total': ('counter', "Ответы FloodWait по методам"),
+    'tg_cleaner_flood_wait_seconds_total': ('counter', "Сколько секунд пришлось ждать из-за FloodWait"),
+    'tg_cleaner_rate_limit': ('gauge', "Текущая скорость ограничителя, запросов в секунду"),
+    'tg_cleaner_messages_scanned_total': ('counter', "Сообщения, которые вернул поиск"),
+    'tg_cleaner_messages_selected_total': ('counter', "Ваши сообщения, подходящие под выборку"),
+    'tg_cleaner_messages_deleted_total': ('counter', "Удаленные сообщения"),
+    'tg_cleaner_messages_skipped_total': ('counter', "Сообщения, которые сервер отказался удалять"),
+    'tg_cleaner_messages_failed_total': ('counter', "Сообщения, не удаленные из-за ошибки"),
+    'tg_cleaner_queue_depth': ('gauge', "Пачки, ожидающие удаления"),
+    'tg_cleaner_start_timestamp_seconds': ('gauge', "Время запуска (unix time)"),
+    'tg_cleaner_last_progress_timestamp_seconds': ('gauge', "Время последнего найденного или удаленного сообщения"),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+class Metrics:
+    """Счетчики, значения и гистограммы с метками, плюс трассировочные интервалы.
+
+    Значения хранятся в словарях {(имя, метки): значение}; render() отдает
+    их в текстовом формате Prometheus. Если задан trace_path, span()
+    дописывает в него по JSON-строке на каждый интервал (чат, пачка):
+    имя, время начала, длительность и поля.
+    """
+
+    def __init__(self, trace_path=None):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.trace = open(trace_path, 'a', encoding='utf-8') if trace_path else None
+        self.set('tg_cleaner_start_timestamp_seconds', time.time())
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            # Счетчики корзин, сумма, количество
+            histogram = self.histograms[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def progress(self):
+        """Отмечает, что работа движется (для оповещения о зависших запусках)"""
+        self.set('tg_cleaner_last_progress_timestamp_seconds', time.time())
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus"""
+        series = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            series.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            series.setdefault(name, []).append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            lines = series.setdefault(name, [])
+            for bound, count in zip(LATENCY_BUCKETS, histogram):
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {count}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram[-1]}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+
+        output = []
+        for name in sorted(series):
+            kind, description = METRICS.get(name, ('untyped', name))
+            output.append(f"# HELP {name} {description}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(series[name])
+        return '\n'.join(output) + '\n'
+
+    def write_textfile(self, path):
+        """Записывает метрики атомарно (для textfile collector node_exporter)"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """Интервал трассировки; в выданный словарь можно добавить поля до его закрытия"""
+        if self.trace is None:
+            yield fields
+            return
+
+        started = time.time()
+        clock = time.monotonic()
+        error = None
+        try:
+            yield fields
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            record = dict(fields, span=name, start=round(started, 3), seconds=round(time.monotonic() - clock, 4))
+            if error:
+                record['error'] = error
+            self.trace.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            self.trace.flush()
+
+    def close(self):
+        if self.trace:
+            self.trace.close()
+            self.trace = None
+
+
+class MetricsExporter:
+    """Отдает метрики по HTTP (GET /metrics) и/или обновляет textfile раз в interval секунд"""
+
+    def __init__(self, metrics, textfile=None, port=None, host='127.0.0.1', interval=TEXTFILE_INTERVAL):
+        self.metrics = metrics
+        self.textfile = textfile
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.server = None
+        self.writer = None
+
+    async def _handle(self, reader, writer):
+        try:
+            await reader.readline()
+            body = self.metrics.render().encode('utf-8')
+            writer.write(
+                b"HTTP/1.0 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _write_periodically(self):
+        while True:
+            self.metrics.write_textfile(self.textfile)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self.port:
+            self.server = await asyncio.start_server(self._handle, self.host, self.port)
+            report('metrics_listening', f"📈 Метрики: http://{self.host}:{self.port}/metrics",
+                   host=self.host, port=self.port)
+        if self.textfile:
+            self.writer = asyncio.create_task(self._write_periodically())
+
+    async def stop(self):
+        if self.writer:
+            self.writer.cancel()
+            try:
+                await self.writer
+            except asyncio.CancelledError:
+                pass
+            self.writer = None
+            # Итоговые значения после завершения
+            self.metrics.write_textfile(self.textfile)
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
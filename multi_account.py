@@ -0,0 +1,318 @@
+"""Очистка нескольких аккаунтов сразу: отдельный процесс job_runner.py на каждый аккаунт
+
+Список аккаунтов - ACCOUNTS в config.py или файл JSON (--accounts):
+
+    [
+        {"name": "alice", "api_id": 12345, "api_hash": "...", "password_env": "ALICE_PASSWORD"},
+        {"name": "bob", "api_id": 12345, "api_hash": "...", "session": "sessions/bob"}
+    ]
+
+Сначала один раз войдите в каждый аккаунт: python multi_account.py --login alice
+Затем запустите задание сразу для всех (параметры после -- передаются job_runner.py):
+
+    python multi_account.py -- --job job.json
+    python multi_account.py --only alice bob --parallel 2 -- --all-chats --since 2024-01-01
+
+У каждого аккаунта свой процесс, свое соединение и свой ограничитель
+скорости, поэтому общая скорость растет почти пропорционально числу
+аккаунтов. Супервизор читает JSON-события процессов, показывает общий
+прогресс и итог по каждому аккаунту.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+from job_runner import EXIT_OK, EXIT_BAD_JOB, EXIT_ERROR, EXIT_INTERRUPTED
+
+# Скрипт, который запускается для каждого аккаунта
+JOB_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_runner.py')
+# Как часто обновляется строка общего прогресса, в секундах
+REPORT_INTERVAL = 1.0
+
+
+class AccountError(ValueError):
+    """Ошибка в списке аккаунтов"""
+
+
+def load_accounts(path=None):
+    """Список аккаунтов из файла JSON или из ACCOUNTS в config.py"""
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                accounts = json.load(f)
+        except OSError as e:
+            raise AccountError(f"Не удалось прочитать список аккаунтов: {e}")
+        except ValueError as e:
+            raise AccountError(f"Неверный формат списка аккаунтов: {e}")
+    else:
+        import config
+        accounts = getattr(config, 'ACCOUNTS', [])
+
+    if not isinstance(accounts, list):
+        raise AccountError("Список аккаунтов должен быть списком объектов")
+    names = set()
+    for account in accounts:
+        if not isinstance(account, dict) or not account.get('name'):
+            raise AccountError("У каждого аккаунта должно быть имя (name)")
+        if not account.get('api_id') or not account.get('api_hash'):
+            raise AccountError(f"Аккаунт {account['name']}: не заданы api_id и api_hash")
+        if account['name'] in names:
+            raise AccountError(f"Аккаунт {account['name']} указан дважды")
+        names.add(account['name'])
+    return accounts
+
+
+def find_account(accounts, name):
+    for account in accounts:
+        if account['name'] == name:
+            return account
+    raise AccountError(f"Аккаунт {name} не найден в списке аккаунтов")
+
+
+class AccountWorker:
+    """Процесс job_runner.py для одного аккаунта и его прогресс по JSON-событиям"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status = 'ожидает'
+        self.process = None
+        self.exit_code = None
+        self.chats_total = 0
+        self.chats_done = 0
+        self.chats_failed = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.error = None
+        self.started_at = None
+        self.seconds = 0.0
+
+    def on_event(self, event):
+        name = event.get('event')
+        if name in ('chats_selected', 'discovery_finished'):
+            self.chats_total = event.get('chats', self.chats_total)
+        elif name in ('chat_done', 'chat_failed'):
+            self.chats_done += 1
+            self.deleted += event.get('deleted', 0)
+            self.skipped += event.get('skipped', 0)
+            if name == 'chat_failed':
+                self.chats_failed += 1
+        elif name == 'auto_expire_stopped':
+            self.deleted += event.get('deleted', 0)
+        if event.get('level') == 'error' and event.get('error'):
+            self.error = event['error']
+
+    async def run(self, command, semaphore, forward=None):
+        async with semaphore:
+            self.status = 'работает'
+            self.started_at = time.monotonic()
+            # stdout процесса - подсказки для человека; все важное приходит событиями в stderr
+            self.process = await asyncio.create_subprocess_exec(
+                *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                async for line in self.process.stderr:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Обычные логи Telethon
+                        continue
+                    if not isinstance(event, dict):
+                        continue
+                    self.on_event(event)
+                    if forward:
+                        forward(dict(event, account=self.name))
+                self.exit_code = await self.process.wait()
+            finally:
+                if self.process.returncode is None:
+                    # Прерывание супервизора: процесс сам сохранит сессию по SIGTERM
+                    self.process.terminate()
+                    self.exit_code = await self.process.wait()
+                self.seconds = time.monotonic() - self.started_at
+                self.status = 'готово' if self.exit_code == EXIT_OK else 'ошибка'
+
+    def terminate(self):
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+
+
+class MultiAccountRunner:
+    """Запускает задание для всех аккаунтов, не больше parallel процессов одновременно"""
+
+    def __init__(self, accounts, job_args, accounts_path=None, parallel=None,
+                 metrics_port_base=None, metrics_dir=None, log_format='text'):
+        self.accounts = accounts
+        self.job_args = job_args
+        self.accounts_path = accounts_path
+        self.parallel = parallel or len(accounts)
+        self.metrics_port_base = metrics_port_base
+        self.metrics_dir = metrics_dir
+        self.log_format = log_format
+        self.workers = [AccountWorker(account['name']) for account in accounts]
+
+    def command(self, index, account):
+        command = [sys.executable, JOB_RUNNER, '--account', account['name'], '--log-format', 'json']
+        if self.accounts_path:
+            command += ['--accounts', self.accounts_path]
+        # Порт и файл метрик у каждого процесса свои
+        if self.metrics_port_base:
+            command += ['--metrics-port', str(self.metrics_port_base + index)]
+        if self.metrics_dir:
+            command += ['--metrics-textfile', os.path.join(self.metrics_dir, f"tg_cleaner_{account['name']}.prom")]
+        return command + self.job_args
+
+    def line(self):
+        running = sum(1 for worker in self.workers if worker.status == 'работает')
+        finished = sum(1 for worker in self.workers if worker.exit_code is not None)
+        chats_done = sum(worker.chats_done for worker in self.workers)
+        chats_total = sum(worker.chats_total for worker in self.workers)
+        deleted = sum(worker.deleted for worker in self.workers)
+        return (
+            f"📊 Аккаунты: {finished}/{len(self.workers)} | в работе: {running}"
+            f" | чаты: {chats_done}/{chats_total} | удалено: {deleted}"
+        )
+
+    async def _report(self):
+        while True:
+            print("\r" + self.line(), end="", flush=True)
+            await asyncio.sleep(REPORT_INTERVAL)
+
+    @staticmethod
+    def _forward(event):
+        print(json.dumps(event, ensure_ascii=False), file=sys.stderr, flush=True)
+
+    def terminate(self):
+        for worker in self.workers:
+            worker.terminate()
+
+    async def run(self):
+        """Выполняет задание во всех аккаунтах и возвращает общий код завершения"""
+        semaphore = asyncio.Semaphore(max(1, self.parallel))
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.terminate)
+        except (NotImplementedError, AttributeError):
+            pass
+
+        json_logs = self.log_format == 'json'
+        reporter = None if json_logs else asyncio.create_task(self._report())
+        try:
+            await asyncio.gather(*(
+                worker.run(self.command(index, account), semaphore, self._forward if json_logs else None)
+                for index, (account, worker) in enumerate(zip(self.accounts, self.workers))
+            ))
+        finally:
+            if reporter:
+                reporter.cancel()
+                try:
+                    await reporter
+                except asyncio.CancelledError:
+                    pass
+                print("\r" + self.line())
+
+        codes = [worker.exit_code for worker in self.workers]
+        if all(code == EXIT_OK for code in codes):
+            return EXIT_OK
+        return max(EXIT_ERROR if code is None else code for code in codes)
+
+    def summary(self):
+        """Итог по каждому аккаунту"""
+        lines = []
+        for worker in self.workers:
+            icon = "✅" if worker.exit_code == EXIT_OK else "❌"
+            line = (f"{icon} {worker.name}: удалено {worker.deleted}, чатов {worker.chats_done}/{worker.chats_total}"
+                    f", за {worker.seconds:.0f} с")
+            if worker.skipped:
+                line += f", пропущено {worker.skipped}"
+            if worker.chats_failed:
+                line += f", чатов с ошибками {worker.chats_failed}"
+            if worker.exit_code != EXIT_OK:
+                line += f" (код {worker.exit_code}{': ' + worker.error if worker.error else ''})"
+            lines.append(line)
+        total = sum(worker.deleted for worker in self.workers)
+        lines.append(f"\n✅ Всего удалено сообщений: {total}")
+        return '\n'.join(lines)
+
+
+async def login(account):
+    """Интерактивный вход в аккаунт и сохранение его зашифрованной сессии"""
+    from user_deleter import UserMessageDeleter
+
+    deleter = UserMessageDeleter(metrics_textfile=None, metrics_port=None, trace_file=None, account=account)
+    try:
+        await deleter.start()
+    finally:
+        await deleter.cleanup_sessions()
+        deleter.checkpoints.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Запуск задания job_runner.py сразу для нескольких аккаунтов",
+        epilog="Параметры задания передаются после --, например: -- --job job.json"
+    )
+    parser.add_argument('--accounts', help="файл списка аккаунтов (JSON); по умолчанию ACCOUNTS из config.py")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="только эти аккаунты")
+    parser.add_argument('--parallel', type=int, help="сколько аккаунтов обрабатывать одновременно (по умолчанию все)")
+    parser.add_argument('--login', metavar='NAME', help="войти в аккаунт и сохранить его сессию")
+    parser.add_argument('--metrics-port-base', type=int, help="порты метрик: первый аккаунт - этот порт, дальше +1")
+    parser.add_argument('--metrics-dir', help="папка для файлов метрик каждого аккаунта")
+    parser.add_argument('--log-format', choices=('json', 'text'), default='text',
+                        help="json - события всех аккаунтов в stderr вместо строки прогресса")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if '--' in argv:
+        split = argv.index('--')
+        argv, job_args = argv[:split], argv[split + 1:]
+    else:
+        job_args = []
+    args = build_parser().parse_args(argv)
+
+    try:
+        accounts = load_accounts(args.accounts)
+        if args.login:
+            account = find_account(accounts, args.login)
+        elif args.only:
+            accounts = [find_account(accounts, name) for name in args.only]
+    except AccountError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return EXIT_BAD_JOB
+
+    if args.login:
+        try:
+            asyncio.run(login(account))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            return EXIT_INTERRUPTED
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return EXIT_BAD_JOB
+        return EXIT_OK
+
+    if not accounts:
+        print("❌ Список аккаунтов пуст: задайте ACCOUNTS в config.py или --accounts", file=sys.stderr)
+        return EXIT_BAD_JOB
+    if not job_args:
+        print("❌ Не задано задание: укажите параметры job_runner.py после --", file=sys.stderr)
+        return EXIT_BAD_JOB
+
+    runner = MultiAccountRunner(
+        accounts, job_args, args.accounts, args.parallel,
+        args.metrics_port_base, args.metrics_dir, args.log_format
+    )
+    print(f"🚀 Запуск задания для {len(accounts)} аккаунтов, до {runner.parallel} одновременно...")
+    try:
+        exit_code = asyncio.run(runner.run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n⚠️ Прерывание пользователем")
+        exit_code = EXIT_INTERRUPTED
+    print(runner.summary())
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Адаптивный ограничитель частоты запросов к Telegram API"""
+import asyncio
+import logging
+import time
+from telethon import errors
+from events import report
+
+# Начальная и предельные скорости, запросов в секунду
+INITIAL_RATE = 1.0
+MIN_RATE = 0.05
+MAX_RATE = 20.0
+# Прибавка скорости после каждого успешного запроса (аддитивный рост)
+RATE_INCREASE = 0.05
+# Во сколько раз снижается скорость после FloodWait (мультипликативный спад)
+RATE_DECREASE = 0.5
+
+# Имена методов, для которых скорость подбирается отдельно
+SEARCH = 'Search'
+# Поиск через takeout-сессию: у нее свои, более мягкие лимиты
+TAKEOUT_SEARCH = 'takeout.Search'
+GET_DIALOGS = 'GetDialogs'
+GET_MESSAGES = 'GetMessages'
+# Скачивание файлов (upload.getFile), например вложений для архива
+GET_FILE = 'GetFile'
+DELETE_MESSAGES = 'DeleteMessages'
+CHANNEL_DELETE_MESSAGES = 'channels.DeleteMessages'
+CHANNEL_DELETE_PARTICIPANT_HISTORY = 'channels.DeleteParticipantHistory'
+DELETE_HISTORY = 'DeleteHistory'
+
+
+class MethodBucket:
+    """Token bucket для одного метода API с AIMD-подстройкой скорости"""
+
+    def __init__(self, rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.flood_waits = 0
+        self.flood_seconds = 0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(1.0, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Ждет, пока метод можно будет вызвать, не превышая текущую скорость"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.requests += 1
+                    return
+
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def on_flood(self, seconds):
+        self.flood_waits += 1
+        self.flood_seconds += seconds
+        self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def state(self):
+        return {
+            'rate': round(self.rate, 3),
+            'requests': self.requests,
+            'flood_waits': self.flood_waits,
+            'flood_seconds': self.flood_seconds,
+            'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 1)
+        }
+
+
+class AdaptiveRateLimiter:
+    """Общий для аккаунта ограничитель с отдельной скоростью на каждый метод.
+
+    Скорость растет понемногу после каждого успешного запроса и резко падает
+    после FloodWait, так что со временем она держится чуть ниже порога,
+    который Telegram готов терпеть для этого аккаунта. Запрос, получивший
+    FloodWait, не теряется: после ожидания он повторяется. Если задан
+    metrics (Metrics), по каждому методу учитываются запросы, их
+    длительность, FloodWait и текущая скорость.
+    """
+
+    def __init__(self, initial_rates=None, min_rate=MIN_RATE, max_rate=MAX_RATE, metrics=None):
+        self.initial_rates = initial_rates or {}
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.metrics = metrics
+        self.buckets = {}
+
+    def bucket(self, method):
+        if method not in self.buckets:
+            rate = self.initial_rates.get(method, INITIAL_RATE)
+            self.buckets[method] = MethodBucket(rate, self.min_rate, self.max_rate)
+        return self.buckets[method]
+
+    def rate(self, method):
+        """Текущая скорость метода, запросов в секунду"""
+        return self.bucket(method).rate
+
+    async def call(self, method, func, *args, **kwargs):
+        """Вызывает func с учетом лимита метода, повторяя его после FloodWait"""
+        bucket = self.bucket(method)
+
+        while True:
+            await bucket.acquire()
+            started = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+            except errors.FloodWaitError as e:
+                report('flood_wait', f"⏰ {method}: слишком много запросов. Ждем {e.seconds} секунд и повторяем...",
+                       logging.WARNING, method=method, seconds=e.seconds)
+                bucket.on_flood(e.seconds)
+                self._record(method, 'flood', started, bucket, e.seconds)
+                continue
+            except Exception:
+                self._record(method, 'error', started, bucket)
+                raise
+
+            bucket.on_success()
+            self._record(method, 'ok', started, bucket)
+            return result
+
+    def _record(self, method, result, started, bucket, flood_seconds=0):
+        if not self.metrics:
+            return
+        self.metrics.inc('tg_cleaner_requests_total', method=method, result=result)
+        self.metrics.observe('tg_cleaner_request_duration_seconds', time.monotonic() - started, method=method)
+        self.metrics.set('tg_cleaner_rate_limit', round(bucket.rate, 3), method=method)
+        if flood_seconds:
+            self.metrics.inc('tg_cleaner_flood_waits_total', method=method)
+            self.metrics.inc('tg_cleaner_flood_wait_seconds_total', flood_seconds, method=method)
+
+    def state(self):
+        """Текущее состояние по всем методам: скорость, запросы, FloodWait"""
+        return {method: bucket.state() for method, bucket in self.buckets.items()}
@@ -0,0 +1,100 @@
+"""Зашифрованное хранение сессии Telegram и кэша диалогов между запусками"""
+import hashlib
+import hmac
+import json
+import os
+import pyaes
+
+# Файл с зашифрованной сессией
+VAULT_PATH = 'user_session.vault'
+# Число итераций PBKDF2 при выводе ключа из пароля
+KDF_ITERATIONS = 200_000
+
+_MAGIC = b'TGV1'
+_SALT_SIZE = 16
+_NONCE_SIZE = 16
+_TAG_SIZE = 32
+
+
+def _derive_keys(password, salt):
+    """Ключ шифрования и ключ HMAC из пароля (PBKDF2-HMAC-SHA256)"""
+    key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, KDF_ITERATIONS, dklen=64)
+    return key[:32], key[32:]
+
+
+def _aes_ctr(key, nonce, data):
+    # В режиме CTR шифрование и расшифровка - одна и та же операция
+    counter = pyaes.Counter(initial_value=int.from_bytes(nonce, 'big'))
+    return pyaes.AESModeOfOperationCTR(key, counter=counter).encrypt(data)
+
+
+def encrypt(password, data):
+    """Шифрует данные: AES-256-CTR, затем HMAC-SHA256 по заголовку и шифртексту"""
+    salt = os.urandom(_SALT_SIZE)
+    nonce = os.urandom(_NONCE_SIZE)
+    enc_key, mac_key = _derive_keys(password, salt)
+    header = _MAGIC + salt + nonce
+    body = header + _aes_ctr(enc_key, nonce, data)
+    return body + hmac.new(mac_key, body, hashlib.sha256).digest()
+
+
+def decrypt(password, blob):
+    """Расшифровывает данные; ValueError при неверном пароле или поврежденном файле"""
+    header_size = len(_MAGIC) + _SALT_SIZE + _NONCE_SIZE
+    if len(blob) < header_size + _TAG_SIZE or not blob.startswith(_MAGIC):
+        raise ValueError("Файл сессии поврежден или имеет неизвестный формат")
+
+    salt = blob[len(_MAGIC):len(_MAGIC) + _SALT_SIZE]
+    nonce = blob[len(_MAGIC) + _SALT_SIZE:header_size]
+    body, tag = blob[:-_TAG_SIZE], blob[-_TAG_SIZE:]
+    enc_key, mac_key = _derive_keys(password, salt)
+    if not hmac.compare_digest(tag, hmac.new(mac_key, body, hashlib.sha256).digest()):
+        raise ValueError("Неверный пароль или файл сессии поврежден")
+    return _aes_ctr(enc_key, nonce, body[header_size:])
+
+
+class SessionVault:
+    """Сессия Telegram (StringSession) и кэш диалогов в одном зашифрованном файле.
+
+    Сохраненная сессия избавляет от входа по коду при каждом запуске, а
+    кэш диалогов хранит InputPeer с access_hash, поэтому чаты не нужно
+    заново получать у сервера. Файл пишется атомарно и доступен только
+    владельцу; без пароля из него ничего нельзя извлечь.
+    """
+
+    def __init__(self, path=VAULT_PATH, password=None):
+        self.path = path
+        self.password = password
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Содержимое хранилища {'session', 'dialogs'} или None, если его нет"""
+        if not self.exists():
+            return None
+        with open(self.path, 'rb') as f:
+            blob = f.read()
+        return json.loads(decrypt(self.password, blob).decode('utf-8'))
+
+    def save(self, session, dialogs=None):
+        """Сохраняет строку сессии и (необязательно) снимок индекса диалогов"""
+        data = json.dumps({'session': session, 'dialogs': dialogs}, ensure_ascii=False)
+        blob = encrypt(self.password, data.encode('utf-8'))
+
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def wipe(self):
+        """Удаляет файл хранилища. Возвращает True, если он был"""
+        removed = False
+        for path in (self.path, self.path + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+                removed = True
+        return removed
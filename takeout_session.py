@@ -0,0 +1,70 @@
+"""Поиск сообщений через takeout-сессию (экспорт данных) с более мягкими лимитами"""
+import logging
+from telethon import errors
+from rate_limiter import TAKEOUT_SEARCH
+from events import report
+
+# Начальная скорость поиска через takeout, запросов в секунду
+TAKEOUT_RATE = 5.0
+
+
+class TakeoutScan:
+    """Переключает поиск OwnMessageScanner на takeout-сессию.
+
+    Takeout (account.initTakeoutSession) предназначен для выгрузки истории,
+    и лимиты на чтение у него заметно выше, чем у обычных запросов. Через
+    сессию идут только запросы поиска; удаление по-прежнему выполняет
+    обычный клиент. Если Telegram отклонил сессию или ждет подтверждения
+    экспорта в приложении, поиск просто остается на обычном клиенте. Если
+    сессия станет недействительной посреди работы, сканер сам вернется на
+    обычный клиент (см. OwnMessageScanner._search).
+    """
+
+    def __init__(self, client, scanner):
+        self.client = client
+        self.scanner = scanner
+        self.takeout = None
+
+    async def start(self):
+        """Открывает takeout-сессию. Возвращает True, если поиск идет через нее"""
+        if self.takeout:
+            return True
+
+        # Незавершенную сессию от прошлого запуска Telethon хранит в файле
+        # сессии; повторно ее можно только продолжить, а не открыть заново
+        if self.client.session.takeout_id is not None:
+            takeout = self.client.takeout(finalize=True)
+        else:
+            takeout = self.client.takeout(
+                finalize=True, users=True, chats=True, megagroups=True, channels=True
+            )
+
+        try:
+            await takeout.__aenter__()
+        except errors.TakeoutInitDelayError as e:
+            report('takeout_delayed', "⏳ Telegram ждет подтверждения экспорта данных (сообщение в приложении Telegram).\n"
+                   f"   Подтвердите его и перезапустите через {e.seconds} с; пока поиск идет через обычный клиент",
+                   logging.WARNING, seconds=e.seconds)
+            return False
+        except errors.RPCError as e:
+            report('takeout_unavailable', f"⚠️ Takeout-сессия недоступна ({e}), поиск идет через обычный клиент",
+                   logging.WARNING, error=str(e))
+            return False
+
+        self.takeout = takeout
+        self.scanner.use_reader(takeout, TAKEOUT_SEARCH)
+        report('takeout_started', "📦 Поиск сообщений идет через takeout-сессию")
+        return True
+
+    async def stop(self):
+        """Завершает takeout-сессию и возвращает поиск на обычный клиент"""
+        if not self.takeout:
+            return
+
+        self.scanner.use_reader(None)
+        takeout, self.takeout = self.takeout, None
+        try:
+            await takeout.__aexit__(None, None, None)
+        except (errors.RPCError, ValueError):
+            # Сессия уже недействительна: достаточно забыть ее id
+            self.client.session.takeout_id = None
@@ -1,34 +1,240 @@
 import asyncio
+import datetime
 import logging
 import os
+import re
 import glob
+import getpass
+import threading
 from telethon import TelegramClient, events
+from telethon.sessions import StringSession
 from telethon.tl.types import InputPeerUser, InputPeerChat, InputPeerChannel
 from telethon import errors
 import time
+import config
 from config import API_ID, API_HASH
+from message_scanner import OwnMessageScanner, MessageSelection, MEDIA_FILTER_NAMES
+from deletion_pipeline import DeletionPipeline
+from rate_limiter import AdaptiveRateLimiter, TAKEOUT_SEARCH
+from bulk_cleaner import BulkCleaner, CONCURRENCY
+from cleanup_planner import CleanupPlanner, format_plan
+from deletion_strategy import DeletionStrategies, ID_BATCHES, REVOKE_HISTORY, STRATEGY_NAMES
+from discovery import OwnMessageDiscovery
+from checkpoint_store import CheckpointStore, STATE_PATH
+from dialog_index import DialogIndex, USER, BOT, GROUP, CHANNEL, CACHE_TTL
+from dialog_browser import DialogPager, DialogFilter, parse_ranges
+from takeout_session import TakeoutScan, TAKEOUT_RATE
+from session_vault import SessionVault, VAULT_PATH
+from expire_daemon import AutoExpireDaemon, ExpiryQueue
+from message_archive import MessageArchive, MEDIA_WORKERS
+from metrics import Metrics, MetricsExporter
+from events import print_events
+
+# Необязательные настройки из config.py
+BULK_CONCURRENCY = getattr(config, 'BULK_CONCURRENCY', CONCURRENCY)
+STATE_DB = getattr(config, 'STATE_DB', STATE_PATH)
+DIALOG_CACHE = getattr(config, 'DIALOG_CACHE', None)
+DIALOG_CACHE_TTL = getattr(config, 'DIALOG_CACHE_TTL', CACHE_TTL)
+USE_TAKEOUT = getattr(config, 'USE_TAKEOUT', False)
+KEEP_SESSION = getattr(config, 'KEEP_SESSION', False)
+SESSION_VAULT = getattr(config, 'SESSION_VAULT', VAULT_PATH)
+SESSION_PASSWORD = getattr(config, 'SESSION_PASSWORD', None) or os.environ.get('TG_CLEANER_PASSWORD')
+# Срок жизни ваших сообщений для автоудаления: {id чата или тип чата: секунды}
+AUTO_EXPIRE = getattr(config, 'AUTO_EXPIRE', {})
+# Папка архива сообщений перед удалением (None - не архивировать)
+ARCHIVE_DIR = getattr(config, 'ARCHIVE_DIR', None)
+ARCHIVE_MEDIA = getattr(config, 'ARCHIVE_MEDIA', False)
+ARCHIVE_MEDIA_WORKERS = getattr(config, 'ARCHIVE_MEDIA_WORKERS', MEDIA_WORKERS)
+# Метрики Prometheus: файл для textfile collector и/или порт HTTP (None - выключено)
+METRICS_TEXTFILE = getattr(config, 'METRICS_TEXTFILE', None)
+METRICS_PORT = getattr(config, 'METRICS_PORT', None)
+# Файл трассировки по чатам и пачкам в JSONL (None - выключено)
+TRACE_FILE = getattr(config, 'TRACE_FILE', None)
+# Сколько раз можно ввести пароль от сохраненной сессии
+PASSWORD_ATTEMPTS = 3
+
+# Отображение типов чатов
+CHAT_ICONS = {USER: "👤", BOT: "🤖", GROUP: "👥", CHANNEL: "📢"}
+CHAT_TYPE_NAMES = {USER: "Личный", BOT: "Бот", GROUP: "Группа", CHANNEL: "Канал"}
+# Команды фильтра по типу в списке чатов
+CHAT_TYPE_COMMANDS = {'личные': USER, 'боты': BOT, 'группы': GROUP, 'каналы': CHANNEL}
 
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+async def ainput(prompt=""):
+    """input() в отдельном потоке, чтобы ожидание ввода не останавливало цикл событий"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def read():
+        try:
+            result = input(prompt)
+        except Exception as e:
+            loop.call_soon_threadsafe(_resolve, future, None, e)
+        else:
+            loop.call_soon_threadsafe(_resolve, future, result, None)
+    
+    # Поток-демон не мешает завершению программы по Ctrl+C
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
 class UserMessageDeleter:
-    def __init__(self):
-        self.client = TelegramClient('user_session', API_ID, API_HASH)
+    def __init__(self, interactive=True, concurrency=BULK_CONCURRENCY, rate_limits=None,
+                 archive_dir=ARCHIVE_DIR, archive_media=ARCHIVE_MEDIA,
+                 metrics_textfile=METRICS_TEXTFILE, metrics_port=METRICS_PORT, trace_file=TRACE_FILE,
+                 account=None):
+        """interactive=False - без вопросов пользователю (для запуска задания без меню).
+        concurrency - сколько чатов обрабатывать одновременно, rate_limits -
+        начальные скорости методов API {метод: запросов в секунду}.
+        archive_dir - папка архива сообщений перед удалением (None - без
+        архива), archive_media - скачивать ли в архив вложения.
+        metrics_textfile, metrics_port, trace_file - куда отдавать метрики и
+        трассировку (все None - не собирать). account - запись из списка
+        аккаунтов (multi_account.py): свои API_ID/API_HASH, всегда
+        зашифрованная сессия {session}.vault и свой файл прогресса
+        {session}.state.db.
+        """
+        api_id, api_hash = API_ID, API_HASH
+        self.vault_path, password, self.state_db = SESSION_VAULT, SESSION_PASSWORD, STATE_DB
+        keep_session = KEEP_SESSION
+        if account:
+            api_id, api_hash = account['api_id'], account['api_hash']
+            session_path = account.get('session') or account['name']
+            self.vault_path, self.state_db = f"{session_path}.vault", f"{session_path}.state.db"
+            password = account.get('password') or os.environ.get(account.get('password_env') or '') or password
+            keep_session = True
+            # Аккаунты работают одновременно, поэтому архив у каждого свой
+            if archive_dir:
+                archive_dir = os.path.join(archive_dir, account['name'])
+        
+        # В режиме KEEP_SESSION сессия берется из зашифрованного хранилища
+        self.vault = None
+        saved = None
+        session = 'user_session'
+        if keep_session:
+            self.vault, saved = self._open_vault(self.vault_path, password, interactive)
+            session = StringSession(saved['session'] if saved else None)
+        
+        # FloodWait обрабатывает общий ограничитель, а не автоматический сон Telethon
+        self.client = TelegramClient(session, api_id, api_hash, flood_sleep_threshold=0)
+        self.metrics = self.exporter = None
+        if metrics_textfile or metrics_port or trace_file:
+            self.metrics = Metrics(trace_file)
+            self.exporter = MetricsExporter(self.metrics, metrics_textfile, metrics_port)
+        self.limiter = AdaptiveRateLimiter(
+            dict({TAKEOUT_SEARCH: TAKEOUT_RATE}, **(rate_limits or {})), metrics=self.metrics
+        )
+        self.scanner = OwnMessageScanner(self.client, self.limiter, metrics=self.metrics)
+        self.checkpoints = CheckpointStore(self.state_db)
+        self.archive = None
+        if archive_dir:
+            self.archive = MessageArchive(
+                self.client, archive_dir, archive_media, ARCHIVE_MEDIA_WORKERS, self.limiter
+            )
+        self.pipeline = DeletionPipeline(
+            self.client, self.limiter, skip_store=self.checkpoints, archive=self.archive, metrics=self.metrics
+        )
+        self.dialogs = DialogIndex(self.client, self.limiter, DIALOG_CACHE, DIALOG_CACHE_TTL)
+        # Способы удаления без поиска обходят архив, поэтому с архивом удаляем только пачками
+        self.strategies = DeletionStrategies(self.client, self.limiter, id_batches_only=self.archive is not None)
+        self.bulk = BulkCleaner(self.scanner, self.pipeline, concurrency, self.checkpoints, self.strategies)
+        self.planner = CleanupPlanner(self.scanner, self.strategies, concurrency)
+        self.discovery = OwnMessageDiscovery(self.scanner, concurrency)
+        self.takeout = TakeoutScan(self.client, self.scanner)
         self.is_running = False
         
+        # Теплый старт: чаты и их access_hash уже известны, запрашивать их заново не нужно
+        if saved and self.dialogs.restore(saved.get('dialogs')):
+            print(f"⚡ Загружено {len(self.dialogs.chats)} чатов из сохраненной сессии")
+    
+    @staticmethod
+    def _open_vault(path, password=None, interactive=True):
+        """Открывает хранилище сессии. Возвращает (vault, содержимое или None)"""
+        vault = SessionVault(path, password)
+        
+        if not interactive and not vault.password:
+            raise ValueError("Не задан пароль сессии (SESSION_PASSWORD или TG_CLEANER_PASSWORD)")
+        
+        if not vault.exists():
+            if not vault.password:
+                print("🔐 Придумайте пароль для шифрования сохраненной сессии")
+                while True:
+                    password = getpass.getpass("Пароль: ")
+                    if password and password == getpass.getpass("Повторите пароль: "):
+                        break
+                    print("❌ Пароли пустые или не совпадают.")
+                vault.password = password
+            return vault, None
+        
+        if vault.password:
+            return vault, vault.load()
+        
+        for attempt in range(PASSWORD_ATTEMPTS):
+            vault.password = getpass.getpass("🔐 Пароль от сохраненной сессии: ")
+            try:
+                return vault, vault.load()
+            except ValueError as e:
+                print(f"❌ {e}")
+        raise ValueError("Не удалось открыть сохраненную сессию")
+    
+    def save_session(self):
+        """Сохраняет сессию и индекс диалогов в зашифрованное хранилище"""
+        if self.vault and self.client.is_connected():
+            self.vault.save(self.client.session.save(), self.dialogs.dump())
+    
+    async def logout_and_wipe(self):
+        """Выход из аккаунта с удалением сессии и локального кэша чатов"""
+        confirm = (await ainput("⚠️ Выйти из аккаунта и удалить сохраненную сессию? (да/нет): ")).strip().lower()
+        if confirm != 'да':
+            print("❌ Операция отменена.")
+            return False
+        
+        try:
+            if self.client.is_connected():
+                await self.takeout.stop()
+                # Ключ авторизации отзывается и на сервере
+                await self.client.log_out()
+        except Exception as e:
+            print(f"⚠️ Не удалось выйти из аккаунта на сервере: {e}")
+        
+        self.vault = None
+        SessionVault(self.vault_path).wipe()
+        self.dialogs.clear()
+        await self.cleanup_sessions()
+        print("🚪 Вы вышли из аккаунта, сессия и кэш чатов удалены")
+        return True
+    
     async def cleanup_sessions(self):
-        """Удаление сессионных файлов"""
+        """Удаление сессионных файлов (в режиме KEEP_SESSION - сохранение сессии)"""
         try:
+            await self.stop_metrics()
+            
+            if self.vault:
+                await self.takeout.stop()
+                self.save_session()
+                await self.client.disconnect()
+                print(f"🔐 Сессия сохранена в зашифрованном файле {self.vault_path}")
+                return
+            
+            print("🧹 Очистка сессионных файлов...")
+            
             # Закрываем клиент перед удалением сессии
             if self.client.is_connected():
+                await self.takeout.stop()
                 await self.client.disconnect()
             
-            # Ищем и удаляем сессионные файлы
-            session_files = glob.glob('user_session*')
+            # Ищем и удаляем сессионные файлы (хранилище удаляет только выход из аккаунта)
+            session_files = [path for path in glob.glob('user_session*') if not path.startswith(SESSION_VAULT)]
             for session_file in session_files:
                 try:
                     os.remove(session_file)
@@ -39,8 +245,14 @@ class UserMessageDeleter:
         except Exception as e:
             print(f"⚠️ Ошибка при очистке сессий: {e}")
         
+    async def stop_metrics(self):
+        """Записывает итоговые метрики и останавливает их отдачу"""
+        if self.exporter:
+            await self.exporter.stop()
+            self.metrics.close()
+    
     async def start(self):
-        """Запуск клиента"""
+        """Запуск клиента и вход в аккаунт"""
         print("🚀 Запуск клиента Telegram...")
         await self.client.start()
         print("✅ Успешный вход в аккаунт!")
@@ -49,282 +261,484 @@ class UserMessageDeleter:
         me = await self.client.get_me()
         print(f"👤 Привет, {me.first_name}!")
         
-        # Показываем меню
-        await self.show_main_menu()
+        # Сохраняем сразу после входа, чтобы сбой не заставил входить заново
+        self.save_session()
+        
+        if USE_TAKEOUT:
+            await self.takeout.start()
+        
+        if self.exporter:
+            await self.exporter.start()
+        
+        if self.archive:
+            media = " вместе с вложениями" if self.archive.download_media else ""
+            print(f"🗄 Сообщения перед удалением сохраняются в архив{media}: {self.archive.directory}")
     
     async def show_main_menu(self):
-        """Главное меню"""
-        print("\n" + "="*50)
-        print("📋 Меню удаления сообщений:")
-        print("1. Показать все чаты (группы, каналы, личные)")
-        print("2. Удалить сообщения в конкретной группе")
-        print("3. Удалить сообщения во всех группах")
-        print("4. Удалить личные сообщения")
-        print("5. Выход")
-        print("="*50)
-        
-        choice = input("Выберите опцию (1-5): ").strip()
-        
-        if choice == "1":
-            await self.show_all_chats()
-        elif choice == "2":
-            await self.delete_in_specific_group()
-        elif choice == "3":
-            await self.delete_in_all_groups()
-        elif choice == "4":
-            await self.delete_private_messages()
-        elif choice == "5":
-            print("👋 До свидания!")
-            print("🧹 Очистка сессионных файлов...")
-            await self.cleanup_sessions()
-            return
-        else:
-            print("❌ Неверный выбор. Попробуйте снова.")
-            await self.show_main_menu()
+        """Главное меню: каждое действие возвращается сюда, пока не выбран выход"""
+        actions = {
+            "1": self.show_all_chats,
+            "2": self.delete_in_specific_group,
+            "3": self.delete_in_all_groups,
+            "4": self.delete_private_messages,
+            "5": self.delete_messages_for_period,
+            "6": self.show_cleanup_plan,
+            "7": self.run_auto_expire
+        }
+        
+        while True:
+            print("\n" + "="*50)
+            print("📋 Меню удаления сообщений:")
+            print("1. Выбрать чаты из списка (поиск, фильтры, несколько сразу)")
+            print("2. Удалить сообщения в конкретной группе")
+            print("3. Удалить сообщения во всех группах")
+            print("4. Удалить личные сообщения")
+            print("5. Удалить сообщения за период или по содержимому в любом чате")
+            print("6. Оценить объем удаления (без удаления)")
+            print("7. Автоудаление сообщений по таймеру (фоновый режим)")
+            print("8. Выйти из аккаунта и удалить сессию")
+            print("9. Выход")
+            print("="*50)
+            
+            choice = (await ainput("Выберите опцию (1-9): ")).strip()
+            
+            if choice in actions:
+                await actions[choice]()
+            elif choice == "8":
+                if await self.logout_and_wipe():
+                    return
+            elif choice == "9":
+                print("👋 До свидания!")
+                await self.cleanup_sessions()
+                return
+            else:
+                print("❌ Неверный выбор. Попробуйте снова.")
     
-    async def show_all_chats(self):
-        """Показать все чаты пользователя"""
-        print("\n🔍 Поиск всех чатов...")
-        
-        dialogs = await self.client.get_dialogs()
-        all_chats = []
-        
-        for dialog in dialogs:
-            chat_info = {
-                'name': dialog.title,
-                'id': dialog.id,
-                'entity': dialog.entity,
-                'type': 'user' if dialog.is_user else 'channel' if dialog.is_channel else 'group'
-            }
-            all_chats.append(chat_info)
-        
-        if not all_chats:
-            print("❌ Чаты не найдены.")
-            await self.show_main_menu()
-            return
-        
-        print(f"\n📋 Найдено {len(all_chats)} чатов:")
-        print("-" * 60)
+    async def show_all_chats(self, selection=None):
+        """Постраничный выбор чатов с поиском по названию и фильтрами"""
+        dialog_filter = DialogFilter()
+        pager = DialogPager(self.client, self.limiter, self.dialogs, dialog_filter)
+        number = 0
+        
+        print("\n📋 Номера (1-3,5) - выбрать | Enter - дальше, < - назад | /текст - поиск по названию")
+        print("   личные, боты, группы, каналы - фильтр по типу | непрочитанные | активные N - за N дней")
+        print("   сброс - убрать фильтры | все - все чаты под фильтром | 0 - возврат")
+        
+        while True:
+            page = await pager.page(number)
+            first = number * pager.page_size
+            
+            filter_text = dialog_filter.describe(CHAT_TYPE_NAMES)
+            if filter_text:
+                print(f"\n🔎 Фильтр: {filter_text}")
+            if not page:
+                print("\n❌ Чаты не найдены.")
+            else:
+                total = f" (всего диалогов: {pager.total})" if pager.total else ""
+                print(f"\n📋 Чаты {first + 1}-{first + len(page)}{total}:")
+                print("-" * 60)
+                for i, chat in enumerate(page, first + 1):
+                    unread = f" | непрочитанных: {chat['unread']}" if chat['unread'] else ""
+                    print(f"{i:4d}. {CHAT_ICONS[chat['type']]} {chat['name']} | {CHAT_TYPE_NAMES[chat['type']]}{unread}")
+                print("-" * 60)
+            
+            choice = (await ainput("\nВаш выбор: ")).strip()
+            command = choice.lower()
+            
+            if command == '0':
+                return
+            if command in ('', '>'):
+                if pager.has_next(number):
+                    number += 1
+                else:
+                    print("ℹ️ Это последняя страница.")
+                continue
+            if command == '<':
+                number = max(0, number - 1)
+                continue
+            if command == 'все':
+                chats = await pager.all()
+                if chats:
+                    await self.delete_in_many_chats(chats, selection)
+                    return
+                print("❌ Чаты не найдены.")
+                continue
+            
+            if command.startswith('/'):
+                dialog_filter.name = choice[1:].strip() or None
+            elif command in CHAT_TYPE_COMMANDS:
+                dialog_filter.chat_types ^= {CHAT_TYPE_COMMANDS[command]}
+            elif command == 'непрочитанные':
+                dialog_filter.unread = not dialog_filter.unread
+            elif command.startswith('активные'):
+                days = command[len('активные'):].strip()
+                if days and not days.isdigit():
+                    print("❌ Укажите число дней, например: активные 7")
+                    continue
+                dialog_filter.active_days = int(days) if days else None
+            elif command == 'сброс':
+                dialog_filter = DialogFilter()
+            else:
+                try:
+                    numbers = parse_ranges(command, len(pager.chats))
+                except ValueError as e:
+                    print(f"❌ Неверный выбор: {e}")
+                    continue
+                
+                chats = [pager.chats[i - 1] for i in numbers]
+                if len(chats) == 1:
+                    await self.delete_messages_in_chat(chats[0], selection)
+                else:
+                    await self.delete_in_many_chats(chats, selection)
+                return
+            
+            # Фильтр изменился: список строится заново с первой страницы
+            pager = DialogPager(self.client, self.limiter, self.dialogs, dialog_filter)
+            number = 0
+    
+    async def _delete_own_messages(self, chat, selection=None, allow_revoke_history=False):
+        """Подсчет, подтверждение и потоковое удаление ваших сообщений
+
+        selection (MessageSelection) ограничивает удаление периодом. Без него
+        удаляются все ваши сообщения в чате с учетом сохраненного прогресса.
+        Если для чата есть способ дешевле пачек по 100 id, используется он.
+        Возвращает словарь {'deleted', 'skipped', 'failed'} или None, если
+        удалять нечего или операция отменена.
+        """
+        entity = chat['entity']
+        selection = selection or MessageSelection()
+        period_text = selection.text
+        checkpoint = None
+        min_id = max_id = 0
+        
+        if selection.is_all:
+            checkpoint = self.checkpoints.begin(chat['id'])
+            if checkpoint.resumed:
+                print(f"♻️ Продолжаю прерванную очистку с сообщения #{checkpoint.max_id}")
+            elif checkpoint.min_id:
+                print(f"⏩ История до сообщения #{checkpoint.min_id} уже очищена, проверяю только новые")
+            min_id, max_id = checkpoint.min_id, checkpoint.max_id
+        
+        peer = await self.client.get_input_entity(entity)
+        confirmed = False
+        
+        strategy = self.strategies.choose(chat, selection, allow_revoke_history)
+        if strategy != ID_BATCHES:
+            print(f"🧭 Способ удаления: {STRATEGY_NAMES[strategy]}")
+            total = await self.scanner.server_count(peer)
+            
+            if not total:
+                print("✅ Ваши сообщения не найдены.")
+                return None
+            
+            if strategy == REVOKE_HISTORY:
+                question = f"⚠️ Удалить весь диалог ({total} сообщений, включая сообщения собеседника) у обоих? (да/нет): "
+            else:
+                question = f"⚠️ Удалить все {total} ваших сообщений одним запросом? (да/нет): "
+            
+            if (await ainput(question)).strip().lower() != 'да':
+                print("❌ Операция отменена.")
+                return None
+            
+            try:
+                deleted_count = await self.strategies.execute(strategy, chat)
+                if checkpoint:
+                    checkpoint.complete()
+                return {'deleted': deleted_count, 'skipped': 0, 'failed': 0}
+            except errors.RPCError as e:
+                print(f"⚠️ Не удалось ({e}), переключаюсь на удаление пачками...")
+                confirmed = True
+        
+        # Предварительный подсчет. Если сервер может посчитать сам, сообщения
+        # потом ищутся заново вместе с удалением; иначе историю все равно нужно
+        # просмотреть, поэтому найденные id сохраняются компактно и переиспользуются
+        selected = None
+        
+        if self.scanner.counts_on_server(peer, min_id, max_id, selection):
+            total = await self.scanner.count(peer, min_id, max_id, selection)
+        else:
+            selected = await self.scanner.collect(peer, min_id, max_id, selection, self.archive)
+            total = len(selected)
         
-        for i, chat in enumerate(all_chats, 1):
-            icon = "👤" if chat['type'] == 'user' else "📢" if chat['type'] == 'channel' else "👥"
-            chat_type = "Личный" if chat['type'] == 'user' else "Канал" if chat['type'] == 'channel' else "Группа"
-            print(f"{i:3d}. {icon} {chat['name']}")
-            print(f"      Тип: {chat_type} | ID: {chat['id']}")
+        if not total:
+            if period_text:
+                print("✅ Ваши сообщения по выбранным условиям не найдены.")
+            else:
+                print("✅ Ваши сообщения не найдены.")
+            return None
         
-        print("-" * 60)
+        if period_text:
+            print(f"📝 Найдено {total} ваших сообщений за {period_text}")
+        else:
+            print(f"📝 Найдено {total} ваших сообщений")
         
-        # Сохраняем чаты для дальнейшего использования
-        self.all_chats = all_chats
+        if not confirmed:
+            confirm = (await ainput(f"⚠️ Удалить все {total} сообщений? (да/нет): ")).strip().lower()
+            
+            if confirm != 'да':
+                print("❌ Операция отменена.")
+                if selected is not None and selected.archived:
+                    print(f"🗄 Найденные сообщения уже сохранены в архив: {self.archive.directory}")
+                return None
         
-        choice = input(f"\nВыберите номер чата для удаления сообщений (1-{len(all_chats)}) или 0 для возврата: ").strip()
+        print("🔄 Начинаю удаление...")
         
-        try:
-            chat_num = int(choice)
-            
-            if chat_num == 0:
-                await self.show_main_menu()
-                return
-            
-            if 1 <= chat_num <= len(all_chats):
-                selected_chat = all_chats[chat_num - 1]
-                await self.delete_messages_in_chat(selected_chat)
-            else:
-                print("❌ Неверный выбор.")
-                await self.show_all_chats()
-                
-        except ValueError:
-            print("❌ Введите число.")
-            await self.show_all_chats()
+        # Поиск и удаление идут одновременно
+        if selected is None:
+            selected = self.scanner.iter_pages(peer, min_id, max_id, selection)
+        return await self.pipeline.run(peer, selected, total, checkpoint=checkpoint)
+    
+    @staticmethod
+    def _print_result(stats, where):
+        """Итог очистки одного чата"""
+        print(f"✅ Удалено {stats['deleted']} сообщений {where}")
+        if stats['skipped']:
+            print(f"⚠️ Пропущено {stats['skipped']} сообщений, которые нельзя удалить (больше не будут проверяться)")
+        if stats['failed']:
+            print(f"❌ Не удалено из-за ошибки: {stats['failed']}. Повторите очистку позже, она продолжится с места остановки")
     
-    async def delete_messages_in_chat(self, chat):
+    async def delete_messages_in_chat(self, chat, selection=None):
         """Удаление сообщений в указанном чате"""
         print(f"\n🔍 Поиск ваших сообщений в чате: {chat['name']}")
+        if selection and selection.text:
+            print(f"📅 Выборка: {selection.text}")
         
         try:
-            # Получаем все сообщения
-            messages = []
-            limit = 10000
-            
-            async for message in self.client.iter_messages(chat['entity'], limit=limit):
-                if message.out:  # Только исходящие сообщения
-                    messages.append(message)
+            stats = await self._delete_own_messages(chat, selection)
             
-            if not messages:
-                print("✅ Ваши сообщения не найдены.")
-                await self.show_main_menu()
-                return 0
-            
-            print(f"📝 Найдено {len(messages)} ваших сообщений")
-            
-            confirm = input(f"⚠️ Удалить все {len(messages)} сообщений? (да/нет): ").strip().lower()
-            
-            if confirm != 'да':
-                print("❌ Операция отменена.")
-                await self.show_main_menu()
+            if stats is None:
                 return 0
             
-            # Удаляем сообщения
-            deleted_count = 0
-            batch_size = 100
-            
-            print("🔄 Начинаю удаление...")
-            
-            for i in range(0, len(messages), batch_size):
-                batch = messages[i:i + batch_size]
-                message_ids = [msg.id for msg in batch]
-                
-                try:
-                    await self.client.delete_messages(chat['entity'], message_ids)
-                    deleted_count += len(batch)
-                    
-                    progress = (deleted_count / len(messages)) * 100
-                    print(f"📊 Прогресс: {deleted_count}/{len(messages)} ({progress:.1f}%)")
-                    
-                    # Небольшая задержка чтобы избежать FloodWait
-                    await asyncio.sleep(1)
-                    
-                except errors.MessageDeleteForbiddenError:
-                    print("❌ Нет прав для удаления некоторых сообщений")
-                    break
-                except errors.FloodWait as e:
-                    print(f"⏰ Слишком много запросов. Ждем {e.seconds} секунд...")
-                    await asyncio.sleep(e.seconds)
-                except Exception as e:
-                    print(f"❌ Ошибка при удалении: {e}")
-                    break
-            
-            print(f"✅ Удалено {deleted_count} сообщений в чате {chat['name']}")
-            await self.show_main_menu()
-            return deleted_count
+            self._print_result(stats, f"в чате {chat['name']}")
+            return stats['deleted']
             
         except Exception as e:
             print(f"❌ Ошибка: {e}")
-            await self.show_main_menu()
             return 0
     
-    async def show_my_groups(self):
-        """Показать все группы и каналы пользователя"""
-        print("\n🔍 Поиск ваших групп и каналов...")
-        
-        dialogs = await self.client.get_dialogs()
-        groups = []
-        
-        for dialog in dialogs:
-            if dialog.is_group or dialog.is_channel:
-                groups.append({
-                    'name': dialog.title,
-                    'id': dialog.id,
-                    'type': 'channel' if dialog.is_channel else 'group',
-                    'entity': dialog.entity
-                })
+    async def delete_in_specific_group(self):
+        """Удаление сообщений в конкретной группе"""
+        groups = await self.dialogs.select(GROUP, CHANNEL)
         
         if not groups:
             print("❌ Группы и каналы не найдены.")
-            await self.show_main_menu()
-            return
-        
-        print(f"\n📋 Найдено {len(groups)} групп/каналов:")
-        print("-" * 60)
-        
-        for i, group in enumerate(groups, 1):
-            group_type = "📢 Канал" if group['type'] == 'channel' else "👥 Группа"
-            print(f"{i:2d}. {group_type}: {group['name']}")
-            print(f"     ID: {group['id']}")
-        
-        print("-" * 60)
-        
-        # Сохраняем группы для дальнейшего использования
-        self.groups = groups
-        
-        choice = input("\nНажмите Enter для возврата в главное меню...")
-        await self.show_main_menu()
-    
-    async def delete_in_specific_group(self):
-        """Удаление сообщений в конкретной группе"""
-        if not hasattr(self, 'groups'):
-            print("🔍 Сначала получите список групп...")
-            await self.show_my_groups()
             return
         
         print("\n📋 Выберите группу для удаления сообщений:")
         
-        for i, group in enumerate(self.groups, 1):
+        for i, group in enumerate(groups, 1):
             group_type = "📢" if group['type'] == 'channel' else "👥"
             print(f"{i:2d}. {group_type} {group['name']}")
         
-        print(f"{len(self.groups)+1:2d}. 🔙 Назад")
+        print(f"{len(groups)+1:2d}. 🔙 Назад")
         
-        try:
-            choice = int(input(f"\nВыберите номер группы (1-{len(self.groups)+1}): ").strip())
+        while True:
+            try:
+                choice = int((await ainput(f"\nВыберите номер группы (1-{len(groups)+1}): ")).strip())
+            except ValueError:
+                print("❌ Введите число.")
+                continue
             
-            if choice == len(self.groups) + 1:
-                await self.show_main_menu()
+            if choice == len(groups) + 1:
                 return
             
-            if 1 <= choice <= len(self.groups):
-                selected_group = self.groups[choice - 1]
-                await self.delete_messages_in_group(selected_group)
-            else:
-                print("❌ Неверный выбор.")
-                await self.delete_in_specific_group()
-                
-        except ValueError:
-            print("❌ Введите число.")
-            await self.delete_in_specific_group()
+            if 1 <= choice <= len(groups):
+                selected_group = groups[choice - 1]
+                selection = await self._ask_selection()
+                if selection is not None:
+                    await self.delete_messages_in_group(selected_group, selection=selection)
+                return
+            
+            print("❌ Неверный выбор.")
     
-    async def delete_private_messages(self):
-        """Удаление личных сообщений"""
-        print("\n📋 Удаление личных сообщений:")
+    async def _ask_period(self):
+        """Выбор периода удаления. Возвращает MessageSelection или None для возврата"""
         print("1. За последние 24 часа")
         print("2. За последнюю неделю")
         print("3. За все время")
+        print("4. За произвольный период")
+        print("5. 🔙 Назад")
+        
+        while True:
+            choice = (await ainput(f"\nВыберите период (1-5): ")).strip()
+            now = datetime.datetime.now(datetime.timezone.utc)
+            
+            if choice == "1":
+                return MessageSelection(now - datetime.timedelta(hours=24), None, "последние 24 часа")
+            elif choice == "2":
+                return MessageSelection(now - datetime.timedelta(days=7), None, "последнюю неделю")
+            elif choice == "3":
+                return MessageSelection(text="все время")
+            elif choice == "4":
+                selection = await self._ask_date_range()
+                if selection:
+                    return selection
+            elif choice == "5":
+                return None
+            else:
+                print("❌ Неверный выбор.")
+    
+    async def _ask_content_filter(self, selection):
+        """Выбор фильтра по содержимому. Возвращает MessageSelection или None для возврата"""
+        print("\n📎 Какие сообщения удалять:")
+        print(" 1. Все сообщения")
+        for i, (media, name) in enumerate(MEDIA_FILTER_NAMES.items(), 2):
+            print(f"{i:2d}. {name}")
+        query_choice = len(MEDIA_FILTER_NAMES) + 2
+        print(f"{query_choice:2d}. Со словом или фразой (поиск на сервере)")
+        print(f"{query_choice + 1:2d}. По регулярному выражению (проверка на клиенте)")
+        print(f"{query_choice + 2:2d}. 🔙 Назад")
+        
+        media_kinds = list(MEDIA_FILTER_NAMES)
+        
+        while True:
+            choice = (await ainput(f"\nВыберите фильтр (1-{query_choice + 2}): ")).strip()
+            media = query = pattern = None
+            
+            try:
+                choice = int(choice)
+            except ValueError:
+                print("❌ Введите число.")
+                continue
+            
+            if choice == 1:
+                return selection
+            elif 2 <= choice < query_choice:
+                media = media_kinds[choice - 2]
+                filter_text = MEDIA_FILTER_NAMES[media].lower()
+            elif choice == query_choice:
+                query = (await ainput("Слово или фраза: ")).strip()
+                if not query:
+                    print("❌ Пустой запрос.")
+                    continue
+                filter_text = f"со словом «{query}»"
+            elif choice == query_choice + 1:
+                pattern = (await ainput("Регулярное выражение: ")).strip()
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    print(f"❌ Неверное выражение: {e}")
+                    continue
+                if not pattern:
+                    print("❌ Пустое выражение.")
+                    continue
+                # Слово для сервера сужает поиск, иначе проверяются все ваши сообщения
+                query = (await ainput("Слово для предварительного поиска на сервере (пусто - без него): ")).strip()
+                filter_text = f"по выражению /{pattern}/"
+            elif choice == query_choice + 2:
+                return None
+            else:
+                print("❌ Неверный выбор.")
+                continue
+            
+            text = f"{selection.text}, {filter_text}" if selection.text else filter_text
+            return MessageSelection(
+                selection.min_date, selection.max_date, text, media=media, query=query, pattern=pattern
+            )
+    
+    async def _ask_selection(self):
+        """Период и фильтр по содержимому. Возвращает MessageSelection или None для возврата"""
+        selection = await self._ask_period()
+        if selection is None:
+            return None
+        return await self._ask_content_filter(selection)
+    
+    async def _ask_date_range(self):
+        """Ввод произвольного периода (локальное время)"""
+        print("Формат даты: ДД.ММ.ГГГГ или ДД.ММ.ГГГГ ЧЧ:ММ, пусто - без ограничения")
+        try:
+            min_date = self._parse_date((await ainput("С: ")).strip())
+            max_date = self._parse_date((await ainput("По: ")).strip(), end_of_day=True)
+        except ValueError:
+            print("❌ Неверный формат даты.")
+            return None
+        
+        if min_date and max_date and min_date >= max_date:
+            print("❌ Начало периода должно быть раньше конца.")
+            return None
+        
+        start = min_date.strftime('%d.%m.%Y %H:%M') if min_date else "начала"
+        end = max_date.strftime('%d.%m.%Y %H:%M') if max_date else "сейчас"
+        return MessageSelection(min_date, max_date, f"период с {start} до {end}")
+    
+    @staticmethod
+    def _parse_date(text, end_of_day=False):
+        """Дата из ввода пользователя; для конца периода дата без времени включает весь день"""
+        if not text:
+            return None
+        try:
+            return datetime.datetime.strptime(text, '%d.%m.%Y %H:%M')
+        except ValueError:
+            date = datetime.datetime.strptime(text, '%d.%m.%Y')
+            return date + datetime.timedelta(days=1) if end_of_day else date
+    
+    async def delete_messages_for_period(self):
+        """Удаление сообщений за период или по содержимому в любом чате"""
+        print("\n📋 Удаление сообщений за период или по содержимому:")
+        
+        selection = await self._ask_selection()
+        if selection is None:
+            return
+        
+        await self.show_all_chats(selection)
+    
+    async def show_cleanup_plan(self):
+        """Оценка объема удаления по счетчикам сервера"""
+        print("\n📋 Оценка объема удаления (сообщения не загружаются и не удаляются):")
+        print("1. Все чаты")
+        print("2. Группы и каналы")
+        print("3. Личные диалоги")
         print("4. 🔙 Назад")
         
-        choice = input(f"\nВыберите период (1-4): ").strip()
+        while True:
+            choice = (await ainput("\nВыберите чаты (1-4): ")).strip()
+            
+            if choice == "1":
+                chats = await self.dialogs.select()
+            elif choice == "2":
+                chats = await self.dialogs.select(GROUP, CHANNEL)
+            elif choice == "3":
+                chats = await self.dialogs.users()
+            elif choice == "4":
+                return
+            else:
+                print("❌ Неверный выбор.")
+                continue
+            break
         
-        if choice == "4":
-            await self.show_main_menu()
+        selection = await self._ask_selection()
+        if selection is None:
             return
         
-        # Определяем период в секундах
-        import datetime
-        now = datetime.datetime.now()
-        
-        if choice == "1":
-            period_hours = 24
-            cutoff_time = now - datetime.timedelta(hours=24)
-            period_text = "последние 24 часа"
-        elif choice == "2":
-            period_hours = 24 * 7
-            cutoff_time = now - datetime.timedelta(days=7)
-            period_text = "последнюю неделю"
-        elif choice == "3":
-            cutoff_time = None  # Все время
-            period_hours = None
-            period_text = "все время"
-        else:
-            print("❌ Неверный выбор.")
-            await self.delete_private_messages()
+        by_media = not selection.media and (await ainput("Показать разбивку по типам медиа? (да/нет): ")).strip().lower() == 'да'
+        
+        print(f"\n🔍 Подсчет в {len(chats)} чатах...")
+        rows = await self.planner.plan(chats, selection, by_media)
+        
+        print("-" * 60)
+        print(format_plan(rows))
+        print("-" * 60)
+        if any(row.get('upper_bound') for row in rows):
+            print("ℹ️ ≤ - в личных диалогах сервер считает и сообщения собеседника,")
+            print("   а регулярное выражение проверяется только при удалении")
+        
+        await ainput("\nНажмите Enter для возврата в главное меню...")
+    
+    async def delete_private_messages(self):
+        """Удаление личных сообщений"""
+        print("\n📋 Удаление личных сообщений:")
+        
+        selection = await self._ask_selection()
+        if selection is None:
             return
         
         print(f"\n🔍 Поиск личных диалогов...")
         
-        # Получаем все диалоги
-        dialogs = await self.client.get_dialogs()
-        private_chats = []
-        
-        for dialog in dialogs:
-            if dialog.is_user and not dialog.is_bot:  # Только личные чаты с пользователями
-                private_chats.append({
-                    'name': dialog.title,
-                    'id': dialog.id,
-                    'entity': dialog.entity
-                })
+        # Только личные чаты с пользователями (без ботов)
+        private_chats = await self.dialogs.users()
         
         if not private_chats:
             print("❌ Личные диалоги не найдены.")
-            await self.show_main_menu()
             return
         
         print(f"📝 Найдено {len(private_chats)} личных диалогов")
@@ -336,192 +750,177 @@ class UserMessageDeleter:
         
         print(f"{len(private_chats)+1:2d}. 🔙 Назад")
         
-        try:
-            chat_choice = int(input(f"\nВыберите номер диалога (1-{len(private_chats)+1}): ").strip())
+        while True:
+            chat_choice = (await ainput(f"\nВыберите номер диалога (1-{len(private_chats)+1}) или 'все' для всех диалогов: ")).strip()
+            
+            if chat_choice.lower() == 'все':
+                allow_revoke_history = selection.is_all and await self._ask_revoke_history()
+                await self.delete_in_many_chats(private_chats, selection, allow_revoke_history)
+                return
+            
+            try:
+                chat_choice = int(chat_choice)
+            except ValueError:
+                print("❌ Введите число.")
+                continue
             
             if chat_choice == len(private_chats) + 1:
-                await self.show_main_menu()
                 return
             
             if 1 <= chat_choice <= len(private_chats):
                 selected_chat = private_chats[chat_choice - 1]
-                await self.delete_private_messages_in_chat(selected_chat, cutoff_time, period_text)
-            else:
-                print("❌ Неверный выбор.")
-                await self.delete_private_messages()
-                
-        except ValueError:
-            print("❌ Введите число.")
-            await self.delete_private_messages()
+                await self.delete_private_messages_in_chat(selected_chat, selection)
+                return
+            
+            print("❌ Неверный выбор.")
+    
+    async def _ask_revoke_history(self):
+        """Разрешение очищать личный диалог целиком (у обоих, вместе с сообщениями собеседника)"""
+        if self.archive:
+            # Очистка диалога целиком обходит архив
+            return False
+        print("ℹ️ За все время диалог можно очистить у обоих собеседников одним запросом,")
+        print("   но тогда будут удалены и сообщения собеседника.")
+        answer = (await ainput("Очищать диалог целиком? (да/нет, нет - только ваши сообщения): ")).strip().lower()
+        return answer == 'да'
     
-    async def delete_private_messages_in_chat(self, chat, cutoff_time, period_text):
+    async def delete_private_messages_in_chat(self, chat, selection):
         """Удаление личных сообщений в конкретном чате"""
         print(f"\n🔍 Поиск ваших сообщений в диалоге: {chat['name']}")
-        print(f"📅 Период: {period_text}")
+        print(f"📅 Выборка: {selection.text}")
+        
+        allow_revoke_history = selection.is_all and await self._ask_revoke_history()
         
         try:
-            # Получаем все сообщения
-            messages = []
-            limit = 10000
-            
-            async for message in self.client.iter_messages(chat['entity'], limit=limit):
-                if message.out:  # Только исходящие сообщения
-                    # Проверяем период
-                    if cutoff_time and message.date < cutoff_time:
-                        continue
-                    messages.append(message)
-            
-            if not messages:
-                print("✅ Ваши сообщения за указанный период не найдены.")
-                await self.show_main_menu()
-                return 0
-            
-            print(f"📝 Найдено {len(messages)} ваших сообщений за {period_text}")
-            
-            confirm = input(f"⚠️ Удалить все {len(messages)} сообщений? (да/нет): ").strip().lower()
+            stats = await self._delete_own_messages(chat, selection, allow_revoke_history)
             
-            if confirm != 'да':
-                print("❌ Операция отменена.")
-                await self.show_main_menu()
+            if stats is None:
                 return 0
             
-            # Удаляем сообщения
-            deleted_count = 0
-            batch_size = 100
-            
-            print("🔄 Начинаю удаление...")
-            
-            for i in range(0, len(messages), batch_size):
-                batch = messages[i:i + batch_size]
-                message_ids = [msg.id for msg in batch]
-                
-                try:
-                    await self.client.delete_messages(chat['entity'], message_ids)
-                    deleted_count += len(batch)
-                    
-                    progress = (deleted_count / len(messages)) * 100
-                    print(f"📊 Прогресс: {deleted_count}/{len(messages)} ({progress:.1f}%)")
-                    
-                    # Небольшая задержка чтобы избежать FloodWait
-                    await asyncio.sleep(1)
-                    
-                except errors.MessageDeleteForbiddenError:
-                    print("❌ Нет прав для удаления некоторых сообщений")
-                    break
-                except errors.FloodWait as e:
-                    print(f"⏰ Слишком много запросов. Ждем {e.seconds} секунд...")
-                    await asyncio.sleep(e.seconds)
-                except Exception as e:
-                    print(f"❌ Ошибка при удалении: {e}")
-                    break
-            
-            print(f"✅ Удалено {deleted_count} сообщений в диалоге {chat['name']}")
-            await self.show_main_menu()
-            return deleted_count
+            self._print_result(stats, f"в диалоге {chat['name']}")
+            return stats['deleted']
             
         except Exception as e:
             print(f"❌ Ошибка: {e}")
-            await self.show_main_menu()
             return 0
     
     async def delete_in_all_groups(self):
         """Удаление сообщений во всех группах"""
-        if not hasattr(self, 'groups'):
-            print("🔍 Сначала получите список групп...")
-            await self.show_my_groups()
+        groups = await self.dialogs.select(GROUP, CHANNEL)
+        
+        if not groups:
+            print("❌ Группы и каналы не найдены.")
             return
         
-        confirm = input(f"\n⚠️ Вы уверены, что хотите удалить сообщения во всех {len(self.groups)} группах? (да/нет): ").strip().lower()
+        print("\n📋 Удаление сообщений во всех группах:")
+        selection = await self._ask_selection()
+        if selection is None:
+            return
+        
+        await self.delete_in_many_chats(groups, selection)
+    
+    async def delete_in_many_chats(self, chats, selection=None, allow_revoke_history=False):
+        """Удаление сообщений сразу во многих чатах с одним подтверждением"""
+        where = f" за {selection.text}" if selection and selection.text else ""
+        
+        # Сначала находим чаты, где ваши сообщения вообще есть
+        print(f"\n🔎 Поиск чатов с вашими сообщениями{where} среди {len(chats)}...")
+        found = await self.discovery.discover(chats, selection)
+        chats = [chat for chat in chats if chat['id'] in found]
+        
+        if not chats:
+            print("✅ Ваши сообщения не найдены ни в одном чате.")
+            return
+        
+        total = sum(info['count'] for info in found.values())
+        print(f"📝 Найдено около {total} ваших сообщений в {len(chats)} чатах")
+        
+        confirm = (await ainput(f"\n⚠️ Вы уверены, что хотите удалить ваши сообщения{where} во всех {len(chats)} чатах? (да/нет): ")).strip().lower()
         
         if confirm != 'да':
             print("❌ Операция отменена.")
-            await self.show_main_menu()
             return
         
-        total_deleted = 0
-        for group in self.groups:
-            print(f"\n🔄 Обработка группы: {group['name']}")
-            deleted = await self.delete_messages_in_group(group, show_menu=False)
-            total_deleted += deleted
+        print(f"🔄 Обработка {len(chats)} чатов, до {self.bulk.concurrency} одновременно...")
+        results = await self.bulk.run(chats, selection, allow_revoke_history, found)
+        
+        total_deleted = sum(result['deleted'] for result in results.values())
+        total_skipped = sum(result['skipped'] for result in results.values())
+        
+        for result in results.values():
+            if result['error']:
+                print(f"❌ {result['name']}: {result['error']}")
+            elif result['failed']:
+                print(f"❌ {result['name']}: не удалено из-за ошибки {result['failed']} сообщений")
+        
+        strategies = {}
+        for result in results.values():
+            strategies[result['strategy']] = strategies.get(result['strategy'], 0) + 1
+        print("🧭 Способы удаления: " + ", ".join(
+            f"{STRATEGY_NAMES[strategy]} - {count}" for strategy, count in strategies.items()
+        ))
         
         print(f"\n✅ Завершено! Всего удалено сообщений: {total_deleted}")
-        await self.show_main_menu()
+        if total_skipped:
+            print(f"⚠️ Пропущено неудаляемых сообщений: {total_skipped}")
     
-    async def delete_messages_in_group(self, group, show_menu=True):
+    async def delete_messages_in_group(self, group, selection=None):
         """Удаление сообщений в указанной группе"""
         print(f"\n🔍 Поиск ваших сообщений в группе: {group['name']}")
+        if selection and selection.text:
+            print(f"📅 Выборка: {selection.text}")
         
         try:
-            # Получаем все сообщения
-            messages = []
-            limit = 10000  # Ограничение для безопасности
-            
-            async for message in self.client.iter_messages(group['entity'], limit=limit):
-                if message.out:  # Только исходящие сообщения (ваши)
-                    messages.append(message)
+            stats = await self._delete_own_messages(group, selection)
             
-            if not messages:
-                print("✅ Ваши сообщения не найдены.")
-                if show_menu:
-                    await self.show_main_menu()
+            if stats is None:
                 return 0
             
-            print(f"📝 Найдено {len(messages)} ваших сообщений")
-            
-            confirm = input(f"⚠️ Удалить все {len(messages)} сообщений? (да/нет): ").strip().lower()
-            
-            if confirm != 'да':
-                print("❌ Операция отменена.")
-                if show_menu:
-                    await self.show_main_menu()
-                return 0
-            
-            # Удаляем сообщения
-            deleted_count = 0
-            batch_size = 100  # Удаляем пачками
-            
-            print("🔄 Начинаю удаление...")
-            
-            for i in range(0, len(messages), batch_size):
-                batch = messages[i:i + batch_size]
-                message_ids = [msg.id for msg in batch]
-                
-                try:
-                    await self.client.delete_messages(group['entity'], message_ids)
-                    deleted_count += len(batch)
-                    
-                    progress = (deleted_count / len(messages)) * 100
-                    print(f"📊 Прогресс: {deleted_count}/{len(messages)} ({progress:.1f}%)")
-                    
-                    # Небольшая задержка чтобы избежать FloodWait
-                    await asyncio.sleep(1)
-                    
-                except errors.MessageDeleteForbiddenError:
-                    print("❌ Нет прав для удаления некоторых сообщений")
-                    break
-                except errors.FloodWait as e:
-                    print(f"⏰ Слишком много запросов. Ждем {e.seconds} секунд...")
-                    await asyncio.sleep(e.seconds)
-                except Exception as e:
-                    print(f"❌ Ошибка при удалении: {e}")
-                    break
-            
-            print(f"✅ Удалено {deleted_count} сообщений в группе {group['name']}")
-            
-            if show_menu:
-                await self.show_main_menu()
-            
-            return deleted_count
+            self._print_result(stats, f"в группе {group['name']}")
+            return stats['deleted']
             
         except Exception as e:
             print(f"❌ Ошибка: {e}")
-            if show_menu:
-                await self.show_main_menu()
             return 0
     
+    def auto_expire_daemon(self):
+        """Демон автоудаления по настройке AUTO_EXPIRE (очередь хранится в STATE_DB)"""
+        return AutoExpireDaemon(
+            self.client, self.scanner, self.pipeline, self.dialogs,
+            ExpiryQueue(self.state_db), AUTO_EXPIRE, self.checkpoints
+        )
+    
+    async def run_auto_expire(self):
+        """Автоудаление ваших сообщений, пока пользователь не остановит его"""
+        if not AUTO_EXPIRE:
+            print("❌ Срок жизни сообщений не задан: настройте AUTO_EXPIRE в config.py")
+            return
+        
+        daemon = self.auto_expire_daemon()
+        task = asyncio.create_task(daemon.run())
+        stop = asyncio.create_task(ainput("⏱ Автоудаление запущено. Нажмите Enter, чтобы остановить...\n"))
+        
+        await asyncio.wait([task, stop], return_when=asyncio.FIRST_COMPLETED)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ Ошибка автоудаления: {e}")
+        finally:
+            daemon.queue.close()
+        
+        print(f"⏹ Автоудаление остановлено. Удалено сообщений: {daemon.deleted}")
+        if not stop.done():
+            # Ввод читается в отдельном потоке: дожидаемся его, чтобы он не перехватил ввод меню
+            print("Нажмите Enter для возврата в главное меню...")
+            await stop
+    
     async def run(self):
         """Основной цикл работы"""
         await self.start()
+        await self.show_main_menu()
 
 async def main():
     """Основная функция"""
@@ -535,17 +934,32 @@ async def main():
         print("5. Скопируйте API_ID и API_HASH")
         return
     
-    deleter = UserMessageDeleter()
+    try:
+        deleter = UserMessageDeleter()
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    
     try:
         await deleter.run()
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n\n⚠️ Прерывание пользователем")
-        print("🧹 Очистка сессионных файлов...")
         await deleter.cleanup_sessions()
     except Exception as e:
         print(f"\n❌ Произошла ошибка: {e}")
-        print("🧹 Очистка сессионных файлов...")
         await deleter.cleanup_sessions()
 
+def setup_logging():
+    """Журнал Telethon и вывод событий очистки в консоль (только для интерактивного запуска)"""
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    print_events()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    setup_logging()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass